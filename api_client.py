@@ -1,12 +1,43 @@
 import httpx
 import asyncio
+import base64
+import json
+import random
+import time
+from dataclasses import replace
+from event_log import EventLog
+from market_stream import MarketStreamParser
+from metrics import Metrics
+from recording import SessionRecorder, SessionReplayer
+from models import Card, CardCounts, Deal, Listing
+from request_policy import RequestFailed, RequestPolicy, failed
+from state_store import StateStore
+
+# Model each cached snapshot is made of, for converting to and from JSON
+SNAPSHOT_MODELS = {"market": Listing, "deals": Deal, "cards": Card}
+
+def token_expiry(token):
+    # `exp` claim of a JWT, or None if the token isn't one. The signature is
+    # the server's business, we only need to know when to log in again.
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, AttributeError):
+        return None
 
 class APIClient:
     BASE_URL = "https://tpot-tcg-backend.onrender.com/api"
     
-    def __init__(self, config):
+    def __init__(self, config, transport=None):
         self.config = config
+        self.transport = transport
         self.token = "idkjustregenme"
+        self.token_expires_at = None
+        self.token_lifetime = None
+        self._login_lock = asyncio.Lock()
+        self._token_refresher = None
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:130.0) Gecko/20100101 Firefox/130.0",
             "Accept": "*/*",
@@ -21,125 +52,528 @@ class APIClient:
         }
         self.headers_bearer = self.headers.copy()
         self.headers_bearer["Authorization"] = f"Bearer {self.token}"
+        self.log = EventLog(config)
+        # The session being replayed, if any
+        self.replay = None
+        self.client = self._build_client()
+        self.pack_listeners = []
+        # Cards whose every listing matters to the planner; the rest of a streamed
+        # market is cut down to the cheapest few per card
+        self.market_watch = set()
+        self.metrics = Metrics(config, self.log)
+        self.policy = RequestPolicy(config, self.log)
+        self.state = StateStore(config)
+        self.state.track("session", self._session_snapshot)
+        self.state.track("snapshots", self._cache_snapshot)
+        self._fan_out_slots = asyncio.Semaphore(self.config.get("http", {}).get("max_concurrency", 8))
+
+        # key -> (fetched_at, data) for the read-mostly snapshot endpoints
+        self._cache = {}
+        # key -> (etag, last_modified, data) from the last full response, for conditional GETs
+        self._validated = {}
+        self.cache_stats = {key: {"hits": 0, "misses": 0, "revalidated": 0} for key in ("market", "deals", "cards")}
+
+    def _build_client(self):
+        http_config = self.config.get("http", {})
+        http2 = http_config.get("http2", False)
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                self.log.warning("http2_missing", "⚠️ HTTP/2 requested but the 'h2' package is missing, falling back to HTTP/1.1")
+                http2 = False
+        if http2:
+            # Connection-specific headers are forbidden on HTTP/2 streams
+            self.headers.pop("Connection", None)
+            self.headers_bearer.pop("Connection", None)
+
+        limits = httpx.Limits(
+            max_connections=http_config.get("max_connections", 20),
+            max_keepalive_connections=http_config.get("max_keepalive_connections", 10),
+            keepalive_expiry=http_config.get("keepalive_expiry", 60),
+        )
+        timeout = httpx.Timeout(
+            http_config.get("timeout", 30),
+            connect=http_config.get("connect_timeout", 10),
+        )
+        transport = self.transport
+        session_config = self.config.get("session", {})
+        if session_config.get("replay"):
+            transport = self.replay = SessionReplayer(session_config["replay"], session_config.get("speed", 1.0),
+                                                      session_config.get("match", "key"))
+            # Same user and same random draws as the recorded run, so it asks for the same things
+            if transport.header.get("username"):
+                self.config["user"]["username"] = transport.header["username"]
+            session_config["seed"] = transport.header.get("seed")
+        elif session_config.get("record"):
+            if session_config.get("seed") is None:
+                session_config["seed"] = random.randrange(2 ** 32)
+            inner = transport or httpx.AsyncHTTPTransport(http2=http2, limits=limits)
+            transport = SessionRecorder(inner, session_config["record"],
+                                        {"username": self.config["user"]["username"], "seed": session_config["seed"]})
+        return httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout, transport=transport)
+
+    async def close(self):
+        if self._token_refresher is not None:
+            self._token_refresher.cancel()
+        self.state.save(force=True)
+        await self.metrics.close()
+        await self.client.aclose()
+        self.log.close()
+
+    def _token_refresh_margin(self):
+        margin = self.config.get("auth", {}).get("refresh_margin", 60)
+        # Short-lived tokens would otherwise be refreshed on every request
+        if self.token_lifetime is not None:
+            margin = min(margin, self.token_lifetime / 4)
+        return margin
+
+    async def refresh_token(self, stale_token):
+        # Single flight: whoever gets the lock first logs in, everyone who was
+        # waiting on the same stale token just picks up the new one
+        async with self._login_lock:
+            if self.token != stale_token:
+                return
+            await self.get_bearer()
+
+    async def ensure_token(self):
+        if self.token_expires_at is not None and time.time() >= self.token_expires_at - self._token_refresh_margin():
+            await self.refresh_token(self.token)
+
+    def start_token_refresher(self):
+        if self._token_refresher is None:
+            self._token_refresher = asyncio.create_task(self._refresh_token_ahead())
+
+    async def _refresh_token_ahead(self):
+        while True:
+            if self.token_expires_at is None:
+                # Not a JWT (or no login yet), expiry is only caught reactively
+                await asyncio.sleep(self._token_refresh_margin())
+                continue
+            await asyncio.sleep(max(1, self.token_expires_at - self._token_refresh_margin() - time.time()))
+            if time.time() >= self.token_expires_at - self._token_refresh_margin():
+                self.log.info("token_refresh", "🔑 Token about to expire, refreshing ahead of time")
+                await self.refresh_token(self.token)
+
+    def _is_token_rejected(self, resp):
+        body = resp.stream_head if hasattr(resp, "stream_head") else resp.content
+        return resp.status_code == 401 or (len(body) < 256 and b"Token expired" in body)
+
+    def restore_state(self):
+        # Picks up where the last run left off: a token that's still good, and the
+        # snapshots we had, aged by however long we were down so the usual TTLs
+        # decide what can be served without asking
+        session = self.state.get("session") or {}
+        token = session.get("token")
+        restored_token = False
+        if token:
+            expires_at = token_expiry(token)
+            self.token_lifetime = session.get("lifetime")
+            # Tokens we can't read an expiry from are tried anyway, a 401 just means one login
+            if expires_at is None or expires_at - time.time() > self._token_refresh_margin():
+                self.token = token
+                self.token_expires_at = expires_at
+                self.headers_bearer["Authorization"] = f"Bearer {self.token}"
+                restored_token = True
+
+        offset = time.time() - time.monotonic()
+        for key, snapshot in (self.state.get("snapshots") or {}).items():
+            if key not in SNAPSHOT_MODELS:
+                continue
+            data = [SNAPSHOT_MODELS[key].from_json(item) for item in snapshot["data"]]
+            self._cache[key] = (snapshot["fetched_at"] - offset, data)
+            if snapshot.get("etag") or snapshot.get("last_modified"):
+                self._validated[key] = (snapshot.get("etag"), snapshot.get("last_modified"), data)
+        return restored_token
+
+    def _session_snapshot(self):
+        return {"token": self.token, "lifetime": self.token_lifetime}
+
+    def _cache_snapshot(self):
+        offset = time.time() - time.monotonic()
+        snapshots = {}
+        for key, (fetched_at, data) in self._cache.items():
+            snapshot = {"fetched_at": fetched_at + offset, "data": [item.to_json() for item in data]}
+            validated = self._validated.get(key)
+            # Validators only describe the data as the server sent it, not a locally patched copy
+            if validated and validated[2] is data:
+                snapshot["etag"], snapshot["last_modified"] = validated[0], validated[1]
+            snapshots[key] = snapshot
+        return snapshots
+
+    async def _stream_body(self, method, url, headers, parser, **kwargs):
+        # A 200 body goes to `parser` chunk by chunk instead of being buffered whole.
+        # The first bytes are kept so error bodies can still be recognised.
+        resp = await self.client.send(self.client.build_request(method, url, headers=headers, **kwargs), stream=True)
+        try:
+            if resp.status_code != 200:
+                await resp.aread()
+                return resp
+            head = b""
+            async for chunk in resp.aiter_bytes():
+                if len(head) < 256:
+                    head += chunk[:256 - len(head)]
+                parser.feed(chunk)
+            resp.stream_head = head
+            resp.parsed = parser.result() if parser.found else None
+        finally:
+            await resp.aclose()
+        return resp
+
+    async def _send(self, method, path, headers, endpoint=None, stream=None, **kwargs):
+        # `endpoint` labels the metrics, so per-user paths don't each get their own series.
+        # `stream` makes a fresh incremental parser for the body, see _stream_body.
+        endpoint = f"{method} {endpoint or path}"
+        # Held here while the backend is down or we're over our request rate
+        await self.policy.admit()
+        start = time.perf_counter()
+        try:
+            if stream is None:
+                resp = await self.client.request(method, f"{self.BASE_URL}{path}", headers=headers, **kwargs)
+            else:
+                resp = await self._stream_body(method, f"{self.BASE_URL}{path}", headers, stream(), **kwargs)
+        except httpx.TimeoutException as e:
+            self.metrics.observe_request(endpoint, time.perf_counter() - start, error="timeout")
+            self.policy.record(error=e)
+            raise
+        except httpx.TransportError as e:
+            self.metrics.observe_request(endpoint, time.perf_counter() - start, error="network")
+            self.policy.record(error=e)
+            raise
+        except asyncio.CancelledError:
+            self.metrics.observe_request(endpoint, time.perf_counter() - start, error="cancelled")
+            self.policy.breaker.abandon()
+            raise
+        except Exception:
+            # A body we couldn't read or parse says nothing about whether the
+            # backend is up, but a probe still has to be let go
+            self.metrics.observe_request(endpoint, time.perf_counter() - start, error="invalid")
+            self.policy.breaker.abandon()
+            raise
+        self.policy.record(resp)
+        received = resp.num_bytes_downloaded if stream is not None else len(resp.content)
+        self.metrics.observe_request(endpoint, time.perf_counter() - start, resp.status_code,
+                                     sent=len(resp.request.content), received=received)
+        return resp
+
+    async def _send_with_retries(self, method, path, endpoint=None, extra_headers=None, **kwargs):
+        # Idempotent requests get a few more tries on network errors and
+        # overloaded-backend statuses, with jittered backoff in between
+        retries = self.policy.retries(method)
+        attempt = 0
+        while True:
+            try:
+                resp = await self._send(method, path, {**self.headers_bearer, **(extra_headers or {})}, endpoint, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    raise
+                reason, delay = type(e).__name__, self.policy.retry_delay(attempt)
+            else:
+                if attempt >= retries or not self.policy.should_retry(resp):
+                    return resp
+                reason, delay = f"HTTP {resp.status_code}", self.policy.retry_delay(attempt, resp)
+            attempt += 1
+            self.metrics.observe_retry(f"{method} {endpoint or path}")
+            self.log.warning("retry", "🔁 {method} {path} failed ({reason}), retry {attempt}/{retries} in {delay:.1f}s",
+                             method=method, path=path, reason=reason, attempt=attempt, retries=retries, delay=delay)
+            await asyncio.sleep(delay)
+
+    async def request(self, method, path, endpoint=None, extra_headers=None, **kwargs):
+        await self.ensure_token()
+        token = self.token
+        resp = await self._send_with_retries(method, path, endpoint, extra_headers, **kwargs)
+        if self._is_token_rejected(resp):
+            self.log.warning("token_rejected", "🔑 Token rejected on {path}, logging in again and retrying", path=path)
+            self.metrics.observe_retry(f"{method} {endpoint or path}")
+            await self.refresh_token(token)
+            resp = await self._send_with_retries(method, path, endpoint, extra_headers, **kwargs)
+        return resp
+
+    async def _conditional_get(self, key, path, extract, stream=None):
+        # Revalidates against the last full response for `key`. Returns the response
+        # and the extracted data, which on a 304 is what we already had.
+        extra_headers = {}
+        validated = self._validated.get(key)
+        if validated:
+            etag, last_modified, data = validated
+            if etag:
+                extra_headers["If-None-Match"] = etag
+            if last_modified:
+                extra_headers["If-Modified-Since"] = last_modified
+        resp = await self.request("GET", path, extra_headers=extra_headers, stream=stream)
+        if resp.status_code == 304 and validated:
+            self.cache_stats[key]["revalidated"] += 1
+            return resp, validated[2]
+        if resp.status_code != 200:
+            return resp, None
+        data = extract(resp.json()) if stream is None else resp.parsed
+        if data is None:
+            return resp, None
+        etag, last_modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validated[key] = (etag, last_modified, data)
+        return resp, data
+
+    async def fan_out(self, calls):
+        # calls: name -> (coroutine, fallback). Runs them concurrently under the shared
+        # concurrency cap, each with its own timeout, and returns results plus timings.
+        timeout = self.config.get("http", {}).get("request_timeout", 20)
+        timings = {}
+
+        async def run(name, coro, fallback):
+            async with self._fan_out_slots:
+                start = time.perf_counter()
+                try:
+                    return await asyncio.wait_for(coro, timeout)
+                except asyncio.TimeoutError:
+                    self.log.warning("timeout", "⌛ {call} timed out after {timeout}s", call=name, timeout=timeout)
+                    return fallback
+                finally:
+                    timings[name] = time.perf_counter() - start
+
+        names = list(calls)
+        results = await asyncio.gather(*(run(name, *calls[name]) for name in names))
+        return dict(zip(names, results)), timings
+
+    def _cache_get(self, key):
+        entry = self._cache.get(key)
+        ttl = self.config.get("cache", {}).get(f"{key}_ttl", 0)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            self.cache_stats[key]["hits"] += 1
+            return entry[1]
+        self.cache_stats[key]["misses"] += 1
+        return None
+
+    def _cache_put(self, key, data):
+        self._cache[key] = (time.monotonic(), data)
+
+    def invalidate_cache(self, key=None):
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def cache_summary(self):
+        return ", ".join(
+            f"{key} {stats['hits']}/{stats['hits'] + stats['misses']} hits"
+            + (f" ({stats['revalidated']} revalidated)" if stats['revalidated'] else "")
+            for key, stats in self.cache_stats.items()
+        )
+
+    def _patch_market_after_buy(self, entry_id, quantity):
+        entry = self._cache.get("market")
+        if entry is None:
+            return
+        fetched_at, listings = entry
+        patched = []
+        for listing in listings:
+            if str(listing.id) == str(entry_id):
+                remaining = listing.quantity - quantity
+                if remaining <= 0:
+                    continue
+                listing = replace(listing, quantity=remaining)
+            patched.append(listing)
+        self._cache["market"] = (fetched_at, patched)
 
     async def get_bearer(self):
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{self.BASE_URL}/login", headers=self.headers, json={
-                    "username": self.config["user"]["username"],
-                    "password": self.config["user"]["password"]
-                })
-                data = resp.json()
-                self.token = data["token"]
-                self.headers_bearer["Authorization"] = f"Bearer {self.token}"
-                print("New token obtained")
+            resp = await self._send("POST", "/login", self.headers, json={
+                "username": self.config["user"]["username"],
+                "password": self.config["user"]["password"]
+            })
+            data = resp.json()
+            self.token = data["token"]
+            self.token_expires_at = token_expiry(self.token)
+            if self.token_expires_at is not None:
+                self.token_lifetime = self.token_expires_at - time.time()
+            self.headers_bearer["Authorization"] = f"Bearer {self.token}"
+            self.log.info("login", "New token obtained")
         except Exception as e:
-            print(f"Error getting bearer token: {e}")
+            self.log.error("login_failed", "Error getting bearer token: {error}", error=str(e))
 
     async def claim(self):
         try:
             data = {"username": self.config["user"]["username"]}
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{self.BASE_URL}/claim-teapot-reward", headers=self.headers_bearer, json=data)
+            resp = await self.request("POST", "/claim-teapot-reward", json=data)
+            if resp.status_code >= 500:
+                self.log.error("claim_failed", "Error claiming reward: HTTP {status}", status=resp.status_code)
+                return RequestFailed(f"HTTP {resp.status_code}", resp.status_code)
             resp_data = resp.json()
             
             if 'reward' in resp_data:
-                return {'wait_time': 0, 'balance': resp_data['balance'], 'cards': resp_data['cards']}
-            elif resp_data == {'message': 'Token expired'}:
-                print("Token expired. Getting new token...")
-                await self.get_bearer()
-                return None
+                return {'wait_time': 0, 'balance': resp_data['balance'], 'cards': CardCounts.from_json(resp_data['cards']),
+                        'reward': resp_data['reward']}
             elif resp_data == {'message': 'Cannot claim reward yet'}:
                 return await self.get_status()
             else:
-                print(f"Unexpected response: {resp_data}")
-                return {'wait_time': 60, 'balance': 0}
+                self.log.error("claim_unexpected", "Unexpected response: {response}", response=resp_data)
+                return RequestFailed(f"unexpected claim response: {resp_data}", resp.status_code)
         except Exception as e:
-            print(f"Error claiming reward: {e}")
-            return {'wait_time': 60, 'balance': 0}
+            self.log.error("claim_failed", "Error claiming reward: {error}", error=str(e))
+            return RequestFailed(str(e))
 
     async def get_status(self):
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.BASE_URL}/teapot-status", headers=self.headers_bearer)
-                data = resp.json()
-                can_claim = data["can_claim"]
-                if not can_claim:
-                    return {'wait_time': data["seconds_until_next_reward"], 'balance': data.get('balance', 0)}
-                return {'wait_time': 0, 'balance': data.get('balance', 0)}
+            resp = await self.request("GET", "/teapot-status")
+            if resp.status_code >= 500:
+                self.log.error("status_failed", "Error getting status: HTTP {status}", status=resp.status_code)
+                return RequestFailed(f"HTTP {resp.status_code}", resp.status_code)
+            data = resp.json()
+            can_claim = data["can_claim"]
+            if not can_claim:
+                return {'wait_time': data["seconds_until_next_reward"], 'balance': data.get('balance', 0)}
+            return {'wait_time': 0, 'balance': data.get('balance', 0)}
         except Exception as e:
-            print(f"Error getting status: {e}")
-            return {'wait_time': 60, 'balance': 0}
+            self.log.error("status_failed", "Error getting status: {error}", error=str(e))
+            return RequestFailed(str(e))
 
     async def get_user_info(self):
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.BASE_URL}/user/{self.config['user']['username']}", headers=self.headers_bearer)
+            resp = await self.request("GET", f"/user/{self.config['user']['username']}", endpoint="/user/{username}")
             data = resp.json()
-            return data['balance'], data['cards']
+            return data['balance'], CardCounts.from_json(data['cards'])
         except Exception as e:
-            print(f"Error getting user info: {e}")
-            return None, None
+            self.log.error("user_info_failed", "Error getting user info: {error}", error=str(e))
+            return RequestFailed(str(e))
 
     async def perform_special_action(self, card_number):
         action_map = {97: "action", 99: "hacker", 100: "aura"}
         action = action_map.get(card_number)
         if not action:
-            print(f"No special action for card {card_number}")
+            self.log.warning("special_unknown", "No special action for card {card}", card=card_number)
             return
         
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{self.BASE_URL}/{action}", headers=self.headers_bearer, json={"username": self.config["user"]["username"]})
-            print(resp.json())
+            resp = await self.request("POST", f"/{action}", json={"username": self.config["user"]["username"]})
+            self.log.info("special", "Special action for card {card}: {response}", card=card_number, response=resp.json())
+        except Exception as e:
+            self.log.error("special_failed", "Error performing special action for card {card}: {error}", card=card_number, error=str(e))
+
+    async def get_market_listings(self, fresh=False):
+        if not fresh:
+            cached = self._cache_get("market")
+            if cached is not None:
+                return cached
+        try:
+            market_config = self.config.get("market", {})
+            stream = None
+            if market_config.get("streaming", False):
+                top_k = market_config.get("top_k", 20)
+                stream = lambda: MarketStreamParser(top_k, self.market_watch)
+            resp, listings = await self._conditional_get(
+                "market", "/market/all", lambda body: [Listing.from_json(entry) for entry in body['entries']], stream,
+            )
+            if listings is None:
+                self.log.error("market_failed", "Error getting market listings: HTTP {status}", status=resp.status_code)
+                return RequestFailed(f"HTTP {resp.status_code}", resp.status_code)
+            self._cache_put("market", listings)
+            return listings
+        except Exception as e:
+            self.log.error("market_failed", "Error getting market listings: {error}", error=str(e))
+            return RequestFailed(str(e))
+
+    async def get_all_cards(self):
+        cached = self._cache_get("cards")
+        if cached is not None:
+            return cached
+        try:
+            resp, cards = await self._conditional_get("cards", "/cards", lambda body: [Card.from_json(card) for card in body.get('cards', [])])
+            if cards is None:
+                self.log.error("cards_failed", "Error fetching all cards: HTTP {status}", status=resp.status_code)
+                return RequestFailed(f"HTTP {resp.status_code}", resp.status_code)
+            self._cache_put("cards", cards)
+            return cards
+        except Exception as e:
+            self.log.error("cards_failed", "Error fetching all cards: {error}", error=str(e))
+            return RequestFailed(str(e))
+
+    async def get_trader_deals(self, fresh=False):
+        if not fresh:
+            cached = self._cache_get("deals")
+            if cached is not None:
+                return cached
+        try:
+            resp, deals = await self._conditional_get("deals", "/trader/deals", lambda body: [Deal.from_json(deal) for deal in body['deals']])
+            if deals is not None:
+                self._cache_put("deals", deals)
+                return deals
+            else:
+                self.log.error("deals_failed", "❌ Couldn't get trader deals: HTTP {status}", status=resp.status_code)
+                return RequestFailed(f"HTTP {resp.status_code}", resp.status_code)
         except Exception as e:
-            print(f"Error performing special action for card {card_number}: {e}")
+            self.log.error("deals_failed", "❌ Error getting trader deals: {error}", error=str(e))
+            return RequestFailed(str(e))
 
-    async def get_market_listings(self):
+    async def execute_trade(self, deal_id):
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.BASE_URL}/market/all", headers=self.headers_bearer)
-                return resp.json()['entries']
+            resp = await self.request("POST", "/trader/trade", json={"deal_id": deal_id})
+            if resp.status_code == 200:
+                # The trader replaces used deals server side, so the cached set is stale
+                self.invalidate_cache("deals")
+                self.log.info("trade", "✅ Trade executed for deal ID: {deal}", deal=deal_id)
+                return True
+            else:
+                self.log.warning("trade_failed", "❌ Trade failed: {response}", deal=deal_id, response=resp.json())
+                return False
         except Exception as e:
-            print(f"Error getting market listings: {e}")
-            return []
+            self.log.error("trade_failed", "❌ Error executing trade: {error}", deal=deal_id, error=str(e))
+            return False
+
+    async def refresh_trader_deals(self):
+        try:
+            resp = await self.request("POST", "/trader/refresh")
+            if resp.status_code == 200:
+                deals = [Deal.from_json(deal) for deal in resp.json()['deals']]
+                self._cache_put("deals", deals)
+                return deals
+            else:
+                self.log.warning("refresh_failed", "❌ Couldn't refresh trader deals: {response}", response=resp.json())
+                return None
+        except Exception as e:
+            self.log.error("refresh_failed", "❌ Error refreshing trader deals: {error}", error=str(e))
+            return None
 
     async def buy_card(self, entry_id, quantity):
         try:
             data = {"entry_id": str(entry_id), "quantity": quantity}
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{self.BASE_URL}/market/buy", headers=self.headers_bearer, json=data)
-                if resp.json() == {"message": "Purchase successful"}:
-                    print(f"Successfully bought card (Entry ID: {entry_id}, Quantity: {quantity})")
-                    return True
-                else:
-                    print(f"Failed to buy card: {resp.json()}")
-                    return False
+            resp = await self.request("POST", "/market/buy", json=data)
+            if resp.json() == {"message": "Purchase successful"}:
+                self._patch_market_after_buy(entry_id, quantity)
+                self.log.debug("buy", "Successfully bought card (Entry ID: {entry}, Quantity: {quantity})", entry=entry_id, quantity=quantity)
+                return True
+            else:
+                self.log.warning("buy_failed", "Failed to buy card: {response}", entry=entry_id, quantity=quantity, response=resp.json())
+                return False
         except Exception as e:
-            print(f"Error buying card: {e}")
+            self.log.error("buy_failed", "Error buying card: {error}", entry=entry_id, quantity=quantity, error=str(e))
             return False
 
     async def open_pack(self):
         try:
             data = {"username": self.config["user"]["username"]}
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(f"{self.BASE_URL}/open-pack", headers=self.headers_bearer, json=data)
+            resp = await self.request("POST", "/open-pack", json=data)
             resp_data = resp.json()
-            print("Opened a pack:")
-            for card in resp_data['new_cards']:
-                print(f"- {card['name']} (#{card['number']}) {'(Holo)' if card['holo'] else ''}")
-            return resp_data['balance'], resp_data['cards']
+            new_cards = [Card.from_json(card) for card in resp_data['new_cards']]
+            for listener in self.pack_listeners:
+                listener(new_cards)
+            self.log.info("pack", "Opened a pack: {cards}", cards=[card.number for card in new_cards])
+            for card in new_cards:
+                self.log.debug("pack_card", "- {name} (#{card}) (Holo)" if card.holo else "- {name} (#{card})",
+                               card=card.number, name=card.name, holo=card.holo)
+            return resp_data['balance'], CardCounts.from_json(resp_data['cards'])
         except Exception as e:
-            print(f"Error opening pack: {e}")
-            return None, None
+            self.log.error("pack_failed", "Error opening pack: {error}", error=str(e))
+            return RequestFailed(str(e))
 
     async def get_card_price(self, entry_id):
         listings = await self.get_market_listings()
-        listing = next((l for l in listings if l['id'] == entry_id), None)
+        if failed(listings):
+            return None
+        listing = next((l for l in listings if l.id == entry_id), None)
         if listing:
-            return listing['price']
+            return listing.price
         else:
-            print(f"❌ Couldn't find price for entry ID: {entry_id}")
+            self.log.warning("price_missing", "❌ Couldn't find price for entry ID: {entry}", entry=entry_id)
             return None
 
     # Add other API methods as needed
\ No newline at end of file
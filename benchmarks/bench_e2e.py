@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_client import APIClient
+from fake_backend import FakeBackend
+
+async def run(args):
+    # Imported once sys.argv only holds the bot's own flags, which config.py parses strictly
+    from config import CONFIG
+    import main
+
+    backend = FakeBackend(
+        seed=args.seed, latency=args.latency, jitter=args.latency / 3, token_ttl=args.token_ttl,
+        claim_interval=args.claim_interval, claim_reward=args.claim_reward,
+        error_rate=args.error_rate, outage=args.outage,
+    )
+    config = copy.deepcopy(CONFIG)
+    config["user"] = {"username": backend.username, "password": backend.password}
+    config["metrics"] = {"path": args.metrics, "summary_every": 0}
+    config["state"] = {"path": None}
+    config["price_history"]["path"] = None
+    config["session"] = {"record": args.record}
+    api_client = APIClient(config, transport=backend.transport())
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output if args.quiet else sys.stdout):
+            await asyncio.wait_for(main.run_bot(api_client), args.timeout)
+        completed = True
+    except asyncio.TimeoutError:
+        completed = False
+    finally:
+        await api_client.close()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    requests = sum(backend.requests.values())
+    cycles = backend.requests.get("POST /claim-teapot-reward", 0)
+    acquired = backend.cards_acquired()
+    print(f"{'completed' if completed else 'timed out'} in {wall:.1f}s wall, {cycles} claim cycles")
+    print(f"cards acquired:     {acquired}")
+    print(f"requests:           {requests} ({requests / max(acquired, 1):.1f} per card acquired)")
+    print(f"coins spent:        {backend.coins_spent:.2f} (claimed {backend.coins_claimed})")
+    print(f"bytes received:     {backend.bytes_sent}")
+    print(f"503s served:        {backend.failed} ({api_client.policy.summary()})")
+    print(f"cpu per cycle:      {cpu / max(cycles, 1) * 1000:.1f}ms (bot and fake backend share the process)")
+    print("requests by endpoint:")
+    for name, count in sorted(backend.requests.items(), key=lambda item: -item[1]):
+        print(f"  {name:<32} {count}")
+    print(f"client metrics:     {api_client.metrics.summary()}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Run main_loop end to end against the in-process fake backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated backend latency in seconds")
+    parser.add_argument("--claim-interval", type=float, default=0.5)
+    parser.add_argument("--claim-reward", type=int, default=40)
+    parser.add_argument("--token-ttl", type=float, default=3600)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 503")
+    parser.add_argument("--outage", type=float, nargs=2, metavar=("START", "DURATION"),
+                        help="Answer everything with a 503 for DURATION seconds, START seconds in")
+    parser.add_argument("--metrics", help="Also write the client's Prometheus metrics to this file")
+    parser.add_argument("--quiet", action="store_true", help="Hide the bot's own output")
+    parser.add_argument("--record", help="Record the session to this file, for bench_replay.py")
+    # Whatever isn't a benchmark flag is the bot's own (--profile and friends) and ends up in CONFIG
+    args, sys.argv[1:] = parser.parse_known_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_cli()
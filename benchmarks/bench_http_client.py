@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_client import APIClient
+
+# The requests one main_loop cycle makes against the backend
+CYCLE = [
+    ("POST", "/claim-teapot-reward"),
+    ("GET", "/user/bench"),
+    ("GET", "/user/bench"),
+    ("GET", "/trader/deals"),
+    ("GET", "/market/all"),
+    ("GET", "/market/all"),
+    ("POST", "/market/buy"),
+    ("GET", "/user/bench"),
+]
+
+class LocalBackend:
+    def __init__(self, rtt, handshake_rtts):
+        self.rtt = rtt
+        self.handshake_delay = rtt * handshake_rtts
+        self.connections = 0
+        self.requests = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        # Emulate the TCP + TLS handshake a fresh connection pays
+        await asyncio.sleep(self.handshake_delay)
+        body = json.dumps({"ok": True}).encode()
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.rtt)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+async def run_cycle_fresh_clients(base_url):
+    for method, path in CYCLE:
+        async with httpx.AsyncClient() as client:
+            await client.request(method, base_url + path, json={} if method == "POST" else None)
+
+async def run_cycle_shared_client(api_client, base_url):
+    for method, path in CYCLE:
+        await api_client.client.request(method, base_url + path, json={} if method == "POST" else None)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def measure(label, backend, cycles, run_cycle):
+    durations = []
+    connections_before = backend.connections
+    for _ in range(cycles):
+        start = time.perf_counter()
+        await run_cycle()
+        durations.append(time.perf_counter() - start)
+    handshakes = (backend.connections - connections_before) / cycles
+    print(f"{label:<16} handshakes/cycle={handshakes:5.2f}  "
+          f"p50={percentile(durations, 50) * 1000:7.1f}ms  "
+          f"p95={percentile(durations, 95) * 1000:7.1f}ms  "
+          f"mean={statistics.mean(durations) * 1000:7.1f}ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare per-call httpx clients with the shared APIClient pool")
+    parser.add_argument("--cycles", type=int, default=30)
+    parser.add_argument("--rtt", type=float, default=0.02, help="Simulated round trip time in seconds")
+    parser.add_argument("--handshake-rtts", type=float, default=3, help="Round trips spent on TCP + TLS setup")
+    args = parser.parse_args()
+
+    backend = LocalBackend(args.rtt, args.handshake_rtts)
+    port = await backend.start()
+    base_url = f"http://127.0.0.1:{port}/api"
+    print(f"{len(CYCLE)} requests/cycle, rtt={args.rtt * 1000:.0f}ms, handshake={backend.handshake_delay * 1000:.0f}ms")
+
+    await measure("before (fresh)", backend, args.cycles, lambda: run_cycle_fresh_clients(base_url))
+
+    api_client = APIClient({"user": {"username": "bench", "password": "bench"}, "http": {}})
+    try:
+        await measure("after (pooled)", backend, args.cycles, lambda: run_cycle_shared_client(api_client, base_url))
+    finally:
+        await api_client.close()
+        await backend.stop()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_stream import MarketStreamParser
+from models import Listing
+from snapshots import synthetic_snapshot
+
+def peak(parse):
+    # Peak traced memory of one parse, and its best wall time untraced
+    gc.collect()
+    tracemalloc.start()
+    result = parse()
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    elapsed = min(timeit.repeat(parse, number=1, repeat=3))
+    return result, size, elapsed
+
+def chunked(body, chunk_size):
+    return (body[i:i + chunk_size] for i in range(0, len(body), chunk_size))
+
+def stream_parse(body, chunk_size, top_k, watched=()):
+    parser = MarketStreamParser(top_k, watched)
+    for chunk in chunked(body, chunk_size):
+        parser.feed(chunk)
+    return parser.result()
+
+def cheapest(listings):
+    best = {}
+    for listing in listings:
+        current = best.get(listing.card.number)
+        if current is None or (listing.price, listing.id) < (current.price, current.id):
+            best[listing.card.number] = listing
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Whole-body json.loads vs streaming top-K parse of /market/all")
+    parser.add_argument("--listings", type=int, default=2000, help="Max listings per card in the synthetic market")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=64 * 1024)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    raw = synthetic_snapshot(args.seed, max_listings=args.listings, deal_count=0)
+    body = json.dumps({"entries": raw['entries']}).encode()
+    print(f"market: {len(raw['entries'])} listings, {len(body) / 1e6:.1f} MB body")
+    del raw
+
+    dicts, dict_peak, dict_time = peak(lambda: json.loads(body)['entries'])
+    models, model_peak, model_time = peak(lambda: [Listing.from_json(entry) for entry in json.loads(body)['entries']])
+    streamed, stream_peak, stream_time = peak(lambda: stream_parse(body, args.chunk, args.top_k))
+    print(f"json.loads dicts:   {dict_peak / 1e6:7.1f} MB peak  {dict_time * 1000:7.0f}ms")
+    print(f"json.loads models:  {model_peak / 1e6:7.1f} MB peak  {model_time * 1000:7.0f}ms")
+    print(f"stream top-{args.top_k}:      {stream_peak / 1e6:7.1f} MB peak  {stream_time * 1000:7.0f}ms  "
+          f"({len(streamed)} of {len(models)} listings kept, {model_peak / stream_peak:.1f}x less memory)")
+
+    # The streamed subset must still agree with the full parse on every card's best price
+    assert cheapest(streamed) == cheapest(models), "streamed market disagrees on the cheapest listings"
+    watched = {1, 2, 3}
+    full = stream_parse(body, 997, args.top_k, watched)
+    assert sum(l.card.number in watched for l in full) == sum(l.card.number in watched for l in models)
+    assert cheapest(full) == cheapest(models)
+    print("cheapest listing per card matches, watched cards kept in full")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card_manager import CardManager
+from market_book import MarketBook
+from modules.auto_trader import calculate_trade_cost
+from planner import CollectionPlanner
+from snapshots import StubClient, parse_snapshot, synthetic_snapshot
+
+CONFIG = {
+    "modules": {"auto_pack_opener": {"pack_price": 5}},
+    "planner": {"time_budget": 0.25, "node_limit": 5000},
+}
+
+# How the bot handled raw JSON before the models, kept as the baseline
+
+def dict_missing_cards(cards):
+    missing = []
+    for i in range(1, 101):
+        if str(i) not in cards or cards[str(i)] == 0:
+            missing.append(i)
+    return missing
+
+def dict_trade_cost(deal, cards, market_book):
+    total_cost = 0
+    for card_data in deal['regular_cards']:
+        card_number = str(card_data['card']['number'])
+        spare_quantity = max(cards.get(card_number, 0) - 1, 0)
+        if spare_quantity < card_data['quantity']:
+            total_cost += market_book.cost_for(int(card_number), card_data['quantity'] - spare_quantity)
+    return total_cost
+
+def held_size(build):
+    gc.collect()
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size
+
+def per_call(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=5)) / number
+
+def main():
+    parser = argparse.ArgumentParser(description="Raw JSON dicts vs typed models: snapshot memory, hot paths and planning time")
+    parser.add_argument("--listings", type=int, default=200, help="Max listings per card in the synthetic market")
+    parser.add_argument("--deals", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    raw = synthetic_snapshot(args.seed, max_listings=args.listings, deal_count=args.deals)
+    print(f"market: {len(raw['entries'])} listings, {len(raw['deals'])} deals")
+
+    dict_bytes = held_size(lambda: synthetic_snapshot(args.seed, max_listings=args.listings, deal_count=args.deals)['entries'])
+    model_bytes = held_size(lambda: parse_snapshot(raw)['entries'])
+    print(f"held listings:   dicts {dict_bytes / 1024:8.0f} KiB   models {model_bytes / 1024:8.0f} KiB   ({dict_bytes / model_bytes:.1f}x smaller)")
+
+    parse_time = per_call(lambda: parse_snapshot(raw), 3)
+    print(f"parse snapshot:  {parse_time * 1000:.1f}ms")
+
+    snapshot = parse_snapshot(raw)
+    cards, deals = snapshot['cards'], snapshot['deals']
+    book = MarketBook(snapshot['entries'])
+
+    before = per_call(lambda: dict_missing_cards(raw['cards']), 2000)
+    after = per_call(lambda: cards.missing(), 2000)
+    print(f"missing set:     dicts {before * 1e6:7.1f}us   models {after * 1e6:7.1f}us   mask {per_call(lambda: cards.missing_mask(), 2000) * 1e6:.2f}us")
+
+    before = per_call(lambda: [dict_trade_cost(deal, raw['cards'], book) for deal in raw['deals']], 200)
+    after = per_call(lambda: [calculate_trade_cost(deal, cards, book) for deal in deals], 200)
+    print(f"trade costs:     dicts {before * 1e6:7.1f}us   models {after * 1e6:7.1f}us   (all {len(deals)} deals)")
+
+    card_manager = CardManager(StubClient(CONFIG))
+    planner = CollectionPlanner(CONFIG, card_manager.expected_pack_cost)
+    missing = card_manager.check_missing_cards(cards)
+    card_manager.expected_pack_cost(0, 0)
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        plan = planner.plan(missing, MarketBook(snapshot['entries']), deals, cards)
+        timings.append(time.perf_counter() - start)
+    print(f"book + plan:     {min(timings) * 1000:.1f}ms for {len(missing)} missing cards ({plan.summary()})")
+
+if __name__ == "__main__":
+    random.seed(0)
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card_manager import CardManager
+from market_book import MarketBook
+from modules.auto_trader import calculate_cheapest_acquisition, get_needed_cards
+from planner import CollectionPlanner, SPECIAL_CARDS
+from snapshots import StubClient, load_snapshot, parse_snapshot, synthetic_snapshot
+
+CONFIG = {
+    "modules": {"auto_pack_opener": {"pack_price": 5}},
+    "planner": {"time_budget": 0.25, "node_limit": 5000},
+}
+
+def take_units(entries, card_number, quantity):
+    # Remove `quantity` units of a card from the cheapest listings, returning their cost
+    cost = 0
+    taken = {}
+    for entry in sorted((e for e in entries if e.card.number == card_number), key=lambda e: e.price):
+        if quantity <= 0:
+            break
+        take = min(quantity, entry.quantity)
+        taken[entry.id] = take
+        cost += take * entry.price
+        quantity -= take
+    entries[:] = [replace(e, quantity=e.quantity - taken.get(e.id, 0)) for e in entries if e.quantity > taken.get(e.id, 0)]
+    return cost
+
+async def run_greedy(snapshot, card_manager):
+    # Replays the old plan_action choice (cheapest single card each turn) until
+    # nothing is missing, then prices what it did under the planner's cost model
+    cards = snapshot['cards'].copy()
+    entries = list(snapshot['entries'])
+    deals = list(snapshot['deals'])
+    spent = 0
+    packed = []
+    while True:
+        missing = [c for c in card_manager.check_missing_cards(cards) if c not in SPECIAL_CARDS and c not in packed]
+        if not missing:
+            break
+        book = MarketBook(entries)
+        options = []
+        for card_number in missing:
+            cost, method = await calculate_cheapest_acquisition(None, card_manager, card_number, deals, book, cards, 0)
+            options.append((cost, method, card_number))
+        cost, method, card_number = min(options)
+        if cost == float('inf'):
+            return float('inf')
+        if method == 'market':
+            spent += take_units(entries, card_number, 1)
+            cards.add(card_number, 1)
+        elif method == 'trade':
+            deal = next(d for d in deals if d.holo_card.number == card_number)
+            for needed_card, quantity in get_needed_cards(deal, cards).items():
+                spent += take_units(entries, needed_card, quantity)
+                cards.add(needed_card, quantity)
+            for card, quantity in deal.regular_cards:
+                cards.add(card.number, -quantity)
+            cards.add(card_number, 1)
+            deals.remove(deal)
+        else:
+            packed.append(card_number)
+    regular = sum(1 for c in packed if c <= 80)
+    return spent + card_manager.expected_pack_cost(regular, len(packed) - regular)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Greedy per-card choice vs the global collection planner")
+    parser.add_argument("snapshots", nargs="*", help="Recorded snapshot JSON files; synthetic ones are used when omitted")
+    parser.add_argument("--synthetic", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.snapshots:
+        snapshots = [load_snapshot(path) for path in args.snapshots]
+    else:
+        snapshots = [synthetic_snapshot(seed) for seed in range(args.synthetic)]
+    snapshots = [parse_snapshot(snapshot) for snapshot in snapshots]
+
+    card_manager = CardManager(StubClient(CONFIG))
+    planner = CollectionPlanner(CONFIG, card_manager.expected_pack_cost)
+
+    savings, greedy_times, plan_times, optimal = [], [], [], 0
+    for index, snapshot in enumerate(snapshots):
+        start = time.perf_counter()
+        greedy_cost = await run_greedy(snapshot, card_manager)
+        greedy_times.append(time.perf_counter() - start)
+
+        missing = card_manager.check_missing_cards(snapshot['cards'])
+        plan = planner.plan(missing, MarketBook(snapshot['entries']), snapshot['deals'], snapshot['cards'])
+        plan_times.append(plan.elapsed)
+        optimal += plan.optimal
+
+        saving = (greedy_cost - plan.total_cost) / greedy_cost * 100 if greedy_cost not in (0, float('inf')) else 0
+        savings.append(saving)
+        print(f"#{index:<3} missing={len(missing):<3} greedy=${greedy_cost:9.2f}  planner=${plan.total_cost:9.2f}  "
+              f"saving={saving:5.1f}%  plan={plan.elapsed * 1000:6.1f}ms nodes={plan.nodes}")
+
+    print(f"\nmean saving {statistics.mean(savings):.1f}%  |  greedy {statistics.mean(greedy_times) * 1000:.1f}ms  "
+          f"planner {statistics.mean(plan_times) * 1000:.1f}ms (p95 {sorted(plan_times)[int(0.95 * (len(plan_times) - 1))] * 1000:.1f}ms)  "
+          f"|  proven optimal {optimal}/{len(snapshots)}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_client import APIClient
+
+async def run(args):
+    # Imported once sys.argv only holds the bot's own flags, which config.py parses strictly
+    from config import CONFIG
+    import main
+
+    # Re-runs the bot against a recorded session, so two versions of the
+    # strategy code can be compared on the exact same market history
+    config = copy.deepcopy(CONFIG)
+    if args.username:
+        config["user"]["username"] = args.username
+    config["metrics"] = {"path": None, "summary_every": 0}
+    config["state"] = {"path": None}
+    config["price_history"]["path"] = None
+    config["policy"]["rate"] = 0
+    config["session"] = {"replay": args.session, "speed": args.speed, "match": args.match}
+    api_client = APIClient(config)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output if args.quiet else sys.stdout):
+            await asyncio.wait_for(main.run_bot(api_client), args.timeout)
+        completed = True
+    except asyncio.TimeoutError:
+        completed = False
+    finally:
+        replay = api_client.replay
+        with contextlib.redirect_stdout(output if args.quiet else sys.stdout):
+            await api_client.close()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    metrics = api_client.metrics
+    plan = metrics.phases.get("plan")
+    print(f"{'completed' if completed else 'stopped'} after {wall:.1f}s wall, {cpu:.2f}s cpu, {metrics.cycles} cycles")
+    print(f"replay:             {replay.summary()}")
+    if plan is not None:
+        print(f"plan phase:         {plan.sum * 1000:.0f}ms total, p50 {plan.quantile(0.5) * 1000:.1f}ms, "
+              f"p95 {plan.quantile(0.95) * 1000:.1f}ms over {plan.count} cycles")
+    print(f"client metrics:     {metrics.summary()}")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay a recorded session through main_loop and profile the planner")
+    parser.add_argument("session", help="Session file written with --record")
+    parser.add_argument("--speed", type=float, default=20, help="Replay speed multiplier, 0 for no delays")
+    parser.add_argument("--match", choices=["key", "order"], default="key")
+    parser.add_argument("--username", help="Username the session was recorded with, for sessions that don't say")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--quiet", action="store_true", help="Hide the bot's own output")
+    # Whatever isn't a benchmark flag is the bot's own (--profile and friends) and ends up in CONFIG
+    args, sys.argv[1:] = parser.parse_known_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_cli()
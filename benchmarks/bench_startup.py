@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_client import APIClient
+from fake_backend import FakeBackend
+
+async def start_once(backend, config):
+    # Runs the bot until it has decided its first action, then stops it
+    import main
+    before = dict(backend.requests)
+    with contextlib.redirect_stdout(io.StringIO()):
+        api_client = APIClient(config, transport=backend.transport())
+    task = asyncio.create_task(main.run_bot(api_client))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            while api_client.metrics.startup is None and not task.done():
+                await asyncio.sleep(0.005)
+            # The bot's log is written from its own thread, let it catch up
+            api_client.log.flush()
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        await api_client.close()
+    requests = {name: count - before.get(name, 0) for name, count in backend.requests.items() if count != before.get(name, 0)}
+    return api_client.metrics.startup, requests
+
+async def run(args):
+    # Imported once sys.argv only holds the bot's own flags, which config.py parses strictly
+    from config import CONFIG
+
+    backend = FakeBackend(seed=args.seed, latency=args.latency, jitter=args.latency / 3, claim_interval=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = copy.deepcopy(CONFIG)
+        config["user"] = {"username": backend.username, "password": backend.password}
+        config["state"] = {"path": os.path.join(tmp, "state.json"), "save_interval": 30}
+        config["price_history"]["path"] = os.path.join(tmp, "price_history")
+        config["metrics"] = {"path": None, "summary_every": 0}
+
+        for run_index in range(args.runs):
+            if run_index:
+                await asyncio.sleep(args.downtime)
+            (seconds, kind), requests = await start_once(backend, config)
+            print(f"{kind:<5} start: first action after {seconds:.3f}s, "
+                  f"{sum(requests.values())} requests ({', '.join(f'{name} {count}' for name, count in sorted(requests.items()))})")
+        print(f"state file: {os.path.getsize(config['state']['path'])} bytes, {backend.revalidated} responses revalidated with 304")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Startup-to-first-action time, cold start vs warm start from the state file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.15, help="Simulated backend latency in seconds")
+    parser.add_argument("--downtime", type=float, default=0, help="Seconds between runs, past the cache TTLs snapshots get revalidated")
+    parser.add_argument("--runs", type=int, default=3, help="The first run is cold, the rest reuse its state")
+    # Whatever isn't a benchmark flag is the bot's own (--log-level and friends) and ends up in CONFIG
+    args, sys.argv[1:] = parser.parse_known_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,249 @@
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import time
+
+import httpx
+
+from snapshots import synthetic_deal, synthetic_listing, synthetic_snapshot
+
+SPECIAL_ACTIONS = {"action": 97, "hacker": 99, "aura": 100}
+ROUTE_PARAM = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+def b64_json(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+def make_token(username, expires_at):
+    # Shaped like a JWT so clients can read `exp`; the signature is not checked
+    return f"{b64_json({'alg': 'none', 'typ': 'JWT'})}.{b64_json({'sub': username, 'exp': expires_at})}.fake"
+
+class FakeBackend:
+    # In-process stand-in for the tpot-tcg backend. Serves the endpoints the bot
+    # uses through an httpx.MockTransport, with per-request latency, expiring
+    # tokens, a claim cooldown and a market that sellers keep restocking.
+
+    def __init__(self, seed=0, latency=0.05, jitter=0.02, token_ttl=3600, claim_interval=1.0,
+                 claim_reward=25, start_balance=50, pack_price=5, refresh_price=10,
+                 restock_per_second=2.0, username="bench", password="bench", error_rate=0.0, outage=None):
+        self.rng = random.Random(seed)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_ttl = token_ttl
+        self.claim_interval = claim_interval
+        self.claim_reward = claim_reward
+        self.pack_price = pack_price
+        self.refresh_price = refresh_price
+        self.restock_per_second = restock_per_second
+        self.username = username
+        self.password = password
+        # Random 503s, and an (start, duration) window after creation when every request gets one
+        self.error_rate = error_rate
+        self.outage = outage
+        self.started = time.monotonic()
+        self.failed = 0
+
+        snapshot = synthetic_snapshot(seed)
+        self.balance = start_balance
+        self.cards = {k: v for k, v in snapshot["cards"].items() if int(k) not in SPECIAL_ACTIONS.values()}
+        self.market = {entry["id"]: entry for entry in snapshot["entries"]}
+        self.deals = {deal["id"]: deal for deal in snapshot["deals"]}
+        self.next_entry_id = max(self.market, default=0) + 1
+        self.next_deal_id = max(self.deals, default=0) + 1
+        self.catalog = [
+            {"number": n, "name": f"Card {n}", "holo": 80 < n < 96}
+            for n in range(1, 101)
+        ]
+
+        self.tokens = {}
+        self.next_claim_at = time.monotonic()
+        self.last_restock = time.monotonic()
+        self.requests = {}
+        self.bytes_sent = 0
+        self.coins_spent = 0
+        self.coins_claimed = 0
+        self.revalidated = 0
+        self.start_owned = self.owned_count()
+        self.routes = [
+            ("POST", r"/login", self.login),
+            ("POST", r"/claim-teapot-reward", self.claim),
+            ("GET", r"/teapot-status", self.status),
+            ("GET", r"/user/(?P<name>[^/]+)", self.user),
+            ("GET", r"/cards", self.all_cards),
+            ("GET", r"/market/all", self.market_all),
+            ("POST", r"/market/buy", self.market_buy),
+            ("POST", r"/open-pack", self.open_pack),
+            ("GET", r"/trader/deals", self.trader_deals),
+            ("POST", r"/trader/trade", self.trader_trade),
+            ("POST", r"/trader/refresh", self.trader_refresh),
+            ("POST", r"/(?P<action>action|hacker|aura)", self.special_action),
+        ]
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    def owned_count(self):
+        return sum(1 for n in range(1, 101) if self.cards.get(str(n), 0) > 0)
+
+    def cards_acquired(self):
+        return self.owned_count() - self.start_owned
+
+    async def handle(self, request):
+        path = request.url.path.removeprefix("/api")
+        for method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if match and request.method == method:
+                name = method + " " + ROUTE_PARAM.sub(r"{\1}", pattern)
+                self.requests[name] = self.requests.get(name, 0) + 1
+                await asyncio.sleep(max(0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+                if self.unavailable():
+                    self.failed += 1
+                    return httpx.Response(503, text="Service Unavailable")
+                self.restock()
+                body = json.loads(request.content) if request.content else {}
+                if handler != self.login and handler != self.all_cards:
+                    error = self.check_token(request)
+                    if error:
+                        return self.respond(401, error)
+                status, payload = handler(body, **match.groupdict())
+                return self.respond(status, payload, request.headers.get("If-None-Match", "") if method == "GET" else None)
+        return self.respond(404, {"message": "Not found"})
+
+    def unavailable(self):
+        if self.outage is not None:
+            start, duration = self.outage
+            if 0 <= time.monotonic() - self.started - start < duration:
+                return True
+        return self.rng.random() < self.error_rate
+
+    def respond(self, status, payload, if_none_match=None):
+        content = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        if status == 200 and if_none_match is not None:
+            # Same weak ETags an Express backend hands out for JSON bodies
+            etag = f'W/"{hashlib.sha1(content).hexdigest()[:16]}"'
+            headers["ETag"] = etag
+            if if_none_match == etag:
+                self.revalidated += 1
+                return httpx.Response(304, headers={"ETag": etag})
+        self.bytes_sent += len(content)
+        return httpx.Response(status, content=content, headers=headers)
+
+    def check_token(self, request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        expires_at = self.tokens.get(token)
+        if expires_at is None:
+            return {"message": "Invalid token"}
+        if time.time() >= expires_at:
+            return {"message": "Token expired"}
+        return None
+
+    def restock(self):
+        now = time.monotonic()
+        new_listings = int((now - self.last_restock) * self.restock_per_second)
+        if new_listings:
+            self.last_restock = now
+            for _ in range(new_listings):
+                card_number = self.rng.randint(1, 95)
+                self.market[self.next_entry_id] = synthetic_listing(self.rng, self.next_entry_id, card_number)
+                self.next_entry_id += 1
+
+    def grant(self, card_number, quantity=1):
+        key = str(card_number)
+        self.cards[key] = self.cards.get(key, 0) + quantity
+
+    def login(self, body):
+        if body.get("username") != self.username or body.get("password") != self.password:
+            return 401, {"message": "Invalid credentials"}
+        token = make_token(self.username, int(time.time() + self.token_ttl))
+        self.tokens[token] = time.time() + self.token_ttl
+        return 200, {"token": token}
+
+    def claim(self, body):
+        now = time.monotonic()
+        if now < self.next_claim_at:
+            return 400, {"message": "Cannot claim reward yet"}
+        self.next_claim_at = now + self.claim_interval
+        self.balance += self.claim_reward
+        self.coins_claimed += self.claim_reward
+        return 200, {"reward": self.claim_reward, "balance": self.balance, "cards": self.cards}
+
+    def status(self, body):
+        wait = max(0.0, self.next_claim_at - time.monotonic())
+        return 200, {"can_claim": wait == 0, "seconds_until_next_reward": wait, "balance": self.balance}
+
+    def user(self, body, name):
+        return 200, {"username": name, "balance": self.balance, "cards": self.cards}
+
+    def all_cards(self, body):
+        return 200, {"cards": self.catalog}
+
+    def market_all(self, body):
+        return 200, {"entries": list(self.market.values())}
+
+    def market_buy(self, body):
+        entry = self.market.get(int(body.get("entry_id", -1)))
+        quantity = int(body.get("quantity", 1))
+        if entry is None:
+            return 404, {"message": "Entry not found"}
+        if entry["quantity"] < quantity:
+            return 400, {"message": "Not enough quantity"}
+        cost = entry["price"] * quantity
+        if cost > self.balance:
+            return 400, {"message": "Insufficient balance"}
+        self.balance -= cost
+        self.coins_spent += cost
+        entry["quantity"] -= quantity
+        if entry["quantity"] == 0:
+            del self.market[entry["id"]]
+        self.grant(entry["card"]["number"], quantity)
+        return 200, {"message": "Purchase successful"}
+
+    def open_pack(self, body):
+        if self.balance < self.pack_price:
+            return 400, {"message": "Insufficient balance"}
+        self.balance -= self.pack_price
+        self.coins_spent += self.pack_price
+        numbers = [self.rng.randint(1, 80) for _ in range(5)]
+        if self.rng.random() < 0.2:
+            numbers.append(self.rng.randint(81, 95))
+        new_cards = []
+        for number in numbers:
+            self.grant(number)
+            new_cards.append({"number": number, "name": f"Card {number}", "holo": number > 80})
+        return 200, {"new_cards": new_cards, "balance": self.balance, "cards": self.cards}
+
+    def trader_deals(self, body):
+        return 200, {"deals": list(self.deals.values())}
+
+    def trader_trade(self, body):
+        deal = self.deals.get(body.get("deal_id"))
+        if deal is None:
+            return 404, {"message": "Deal not found"}
+        for card_data in deal["regular_cards"]:
+            if self.cards.get(str(card_data["card"]["number"]), 0) < card_data["quantity"]:
+                return 400, {"message": "Missing cards for trade"}
+        for card_data in deal["regular_cards"]:
+            self.grant(card_data["card"]["number"], -card_data["quantity"])
+        self.grant(deal["holo_card"]["number"])
+        del self.deals[deal["id"]]
+        self.deals[self.next_deal_id] = synthetic_deal(self.rng, self.next_deal_id)
+        self.next_deal_id += 1
+        return 200, {"message": "Trade successful"}
+
+    def trader_refresh(self, body):
+        if self.balance < self.refresh_price:
+            return 400, {"message": "Insufficient balance"}
+        self.balance -= self.refresh_price
+        self.coins_spent += self.refresh_price
+        self.deals = {}
+        for _ in range(4):
+            self.deals[self.next_deal_id] = synthetic_deal(self.rng, self.next_deal_id)
+            self.next_deal_id += 1
+        return 200, {"deals": list(self.deals.values())}
+
+    def special_action(self, body, action):
+        self.grant(SPECIAL_ACTIONS[action])
+        return 200, {"message": f"{action} done"}
@@ -0,0 +1,76 @@
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import CardCounts, Deal, Listing
+from state_store import StateStore
+
+# Snapshots use the backend's own shapes: {"cards": {...}, "balance": ...,
+# "entries": [...market/all entries...], "deals": [...trader/deals...]}
+
+class StubClient:
+    # Just enough of APIClient to build a CardManager outside the bot
+    def __init__(self, config):
+        self.config = config
+        self.pack_listeners = []
+        # No state path, so nothing is restored or saved
+        self.state = StateStore({})
+
+def load_snapshot(path):
+    with open(path) as f:
+        return json.load(f)
+
+def parse_snapshot(snapshot):
+    # The same snapshot as the bot holds it, as models instead of raw JSON
+    return {
+        "cards": CardCounts.from_json(snapshot["cards"]),
+        "balance": snapshot.get("balance"),
+        "entries": [Listing.from_json(entry) for entry in snapshot["entries"]],
+        "deals": [Deal.from_json(deal) for deal in snapshot["deals"]],
+    }
+
+def synthetic_listing(rng, entry_id, card_number):
+    holo = card_number > 80
+    base_price = rng.uniform(40, 160) if holo else rng.uniform(1, 12)
+    return {
+        "id": entry_id,
+        "price": round(base_price * rng.uniform(1, 1.6), 2),
+        "quantity": rng.randint(1, 3),
+        "card": {"number": card_number, "name": f"Card {card_number}", "holo": holo},
+    }
+
+def synthetic_deal(rng, deal_id):
+    holo_card_number = rng.randint(81, 95)
+    inputs = rng.sample(range(1, 81), rng.randint(2, 4))
+    return {
+        "id": deal_id,
+        "holo_card": {"number": holo_card_number, "name": f"Card {holo_card_number}", "holo": True},
+        "regular_cards": [
+            {"card": {"number": card_number, "name": f"Card {card_number}"}, "quantity": rng.randint(1, 3)}
+            for card_number in inputs
+        ],
+    }
+
+def synthetic_snapshot(seed, owned_fraction=0.7, max_listings=6, deal_count=4, market_coverage=0.85):
+    rng = random.Random(seed)
+    cards = {}
+    for card_number in range(1, 96):
+        if rng.random() < owned_fraction:
+            cards[str(card_number)] = rng.randint(1, 4)
+    for card_number in range(96, 101):
+        cards[str(card_number)] = 1
+
+    entries = []
+    entry_id = 1
+    for card_number in range(1, 96):
+        if rng.random() > market_coverage:
+            continue
+        for _ in range(rng.randint(1, max_listings)):
+            entries.append(synthetic_listing(rng, entry_id, card_number))
+            entry_id += 1
+
+    deals = [synthetic_deal(rng, deal_id) for deal_id in range(1, deal_count + 1)]
+
+    return {"cards": cards, "balance": 500, "entries": entries, "deals": deals}
@@ -1,39 +1,53 @@
-import httpx
+from pack_model import PackSimulator
+from request_policy import failed
 
 class CardManager:
     def __init__(self, api_client):
         self.api_client = api_client
         self.all_cards = []
+        self.pack_model = PackSimulator(api_client.config)
+        # Every pack we open is a sample of the real drop rates
+        api_client.pack_listeners.append(self.pack_model.observe_pack)
 
     async def fetch_all_cards(self):
-        try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.get(f"{self.api_client.BASE_URL}/cards", headers=self.api_client.headers_bearer)
-                data = resp.json()
-                self.all_cards = data.get('cards', [])
-            print(f"Fetched {len(self.all_cards)} cards")
-        except Exception as e:
-            print(f"Error fetching all cards: {e}")
+        all_cards = await self.api_client.get_all_cards()
+        if failed(all_cards):
+            self.api_client.log.warning("catalog_failed", "⚠️ Couldn't fetch the card catalog ({reason}), the pack model starts from defaults",
+                                        reason=str(all_cards))
+        else:
+            self.all_cards = all_cards
+            self.pack_model.set_catalog(self.all_cards)
+        if self.pack_model.restore(self.api_client.state.get("pack_model")):
+            self.api_client.log.info("pack_model_restored", "💾 Restored pack model ({packs} packs observed)",
+                                     packs=self.pack_model.observed_packs)
+        # Run the simulation up front so the first plan doesn't pay for it
+        self.pack_model.pack_table()
+        if not failed(all_cards):
+            self.api_client.log.info("catalog", "Fetched {cards} cards", cards=len(self.all_cards))
 
     def check_missing_cards(self, cards):
-        missing = []
-        for i in range(1, 101):
-            if str(i) not in cards or cards[str(i)] == 0:
-                missing.append(i)
-        return missing
+        return cards.missing()
 
     def calculate_card_acquisition_efficiency(self, card_number, market_price):
         pack_price = self.api_client.config["modules"]["auto_pack_opener"]["pack_price"]
         
-        if card_number <= 80:  # Regular card
-            prob_in_pack = 1 - (79/80)**5  # Probability of getting at least one in 5 draws
-        else:  # Holo card
-            prob_in_pack = 0.2 * (1/15)  # 20% chance of holo, then 1/15 chance of specific holo
-        
-        expected_packs_needed = 1 / prob_in_pack
+        expected_packs_needed = self.pack_model.expected_packs([card_number]).mean
         expected_cost_from_packs = expected_packs_needed * pack_price
         
         if expected_cost_from_packs < market_price:
             return "pack", expected_cost_from_packs
         else:
-            return "market", market_price
\ No newline at end of file
+            return "market", market_price
+
+    def expected_pack_cost(self, regular_count, holo_count):
+        pack_price = self.api_client.config["modules"]["auto_pack_opener"]["pack_price"]
+        table = self.pack_model.pack_table()
+        regular_count = min(regular_count, table.shape[0] - 1)
+        holo_count = min(holo_count, table.shape[1] - 1)
+        return float(table[regular_count, holo_count]) * pack_price
+
+    def pack_outlook(self, missing_cards, card_values):
+        pack_price = self.api_client.config["modules"]["auto_pack_opener"]["pack_price"]
+        marginal_value = self.pack_model.marginal_pack_value(missing_cards, card_values)
+        completion_cost = self.pack_model.expected_completion_cost(missing_cards, pack_price)
+        return marginal_value, completion_cost
\ No newline at end of file
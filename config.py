@@ -3,6 +3,14 @@ import argparse
 parser = argparse.ArgumentParser(description='TPOT TCG Bot')
 parser.add_argument('-username', type=str, help='Username for the bot')
 parser.add_argument('-password', type=str, help='Password for the bot')
+parser.add_argument('--record', type=str, metavar='PATH', help='Record all API traffic to a compressed session file')
+parser.add_argument('--replay', type=str, metavar='PATH', help='Answer API requests from a recorded session instead of the backend')
+parser.add_argument('--replay-speed', type=float, default=1.0, help='Replay speed multiplier, 0 for no delays')
+parser.add_argument('--replay-match', choices=['key', 'order'], default='key', help='Match recorded responses by request or by order')
+parser.add_argument('--profile', choices=['timers', 'cprofile', 'sample'], help='Profile main loop phases')
+parser.add_argument('--profile-cycles', type=int, default=5, help='Cycles to run cProfile or the sampler for')
+parser.add_argument('--log-level', choices=['debug', 'info', 'warning', 'error'], default='info', help='Lowest level printed to the console')
+parser.add_argument('--log-file', type=str, metavar='PATH', help='Also write every record, debug included, to a rotating JSON-lines file')
 args = parser.parse_args()
 
 CONFIG = {
@@ -10,6 +18,117 @@ CONFIG = {
         "username": args.username if args.username else "addyourusernamehere",
         "password": args.password if args.password else "addyourusernamehere"
     },
+    "http": {
+        "http2": False,
+        "max_connections": 20,
+        "max_keepalive_connections": 10,
+        "keepalive_expiry": 60,
+        "timeout": 30,
+        "connect_timeout": 10,
+        "max_concurrency": 8,
+        "request_timeout": 20
+    },
+    "session": {
+        "record": args.record,
+        "replay": args.replay,
+        "speed": args.replay_speed,
+        "match": args.replay_match,
+        # Seeds the bot's random draws; recording picks one when unset and a replay uses the recorded one
+        "seed": None
+    },
+    "policy": {
+        # A replay has no backend to protect
+        "rate": 0 if args.replay else 20,
+        "burst": 40,
+        "get_retries": 2,
+        "retry_delay": 0.5,
+        "max_retry_delay": 8,
+        "failure_threshold": 5,
+        "reset_timeout": 5,
+        "max_reset_timeout": 120
+    },
+    "auth": {
+        "refresh_margin": 60
+    },
+    "market": {
+        "streaming": True,
+        "top_k": 20
+    },
+    "cache": {
+        "market_ttl": 5,
+        "deals_ttl": 15,
+        "cards_ttl": 3600
+    },
+    "state": {
+        # A replay starts cold and leaves the real state alone
+        "path": None if args.replay else "state.json",
+        "save_interval": 30
+    },
+    "log": {
+        "console_level": args.log_level,
+        "file_level": "debug",
+        "path": args.log_file,
+        "max_bytes": 5_000_000,
+        "backups": 3,
+        # Debug records per event and second before sampling kicks in
+        "debug_rate": 20,
+        "debug_sample": 10,
+        "max_queue": 10000
+    },
+    "price_history": {
+        # A replay shouldn't mix its market into the real one's history
+        "path": None if args.replay else "price_history",
+        "min_interval": 30,
+        "recent_rows": 4096,
+        "bucket": 900,
+        "archive_rows": 2880,
+        "window": 86400,
+        "min_samples": 20,
+        "spike_margin": 0.25,
+        "bargain_quantile": 0.1
+    },
+    "metrics": {
+        "path": "metrics.prom",
+        "port": None,
+        "summary_every": 10
+    },
+    "scheduler": {
+        "market_interval": 2,
+        "market_max_interval": 30,
+        "deals_interval": 5,
+        "deals_max_interval": 60,
+        "reconcile_interval": 10,
+        "plan_interval": 15,
+        "growth": 1.5,
+        "error_delay": 1,
+        "max_error_delay": 60,
+        "claim_slack": 0.05
+    },
+    "inventory": {
+        "reconcile_interval": 300
+    },
+    "income": {
+        "reward": None,
+        "interval": None,
+        "smoothing": 0.3
+    },
+    "profiling": {
+        "mode": args.profile,
+        "cycles": args.profile_cycles,
+        "sample_interval": 0.005,
+        "lag_interval": 0.05,
+        "block_threshold": 0.1,
+        "output": "profile"
+    },
+    "planner": {
+        "time_budget": 0.25,
+        "node_limit": 5000
+    },
+    "pack_model": {
+        "trials": 2000,
+        "max_packs": 5000,
+        "recalibrate_every": 25
+    },
     "modules": {
         "auto_complete_collection": {
             "enabled": True
@@ -17,11 +136,18 @@ CONFIG = {
         "auto_pack_opener": {
             "enabled": True,
             "pack_price": 5,
-            "min_balance": 0
+            "min_balance": 0,
+            # Packs opening at once when spending on packs; 1 opens them one by one
+            "max_in_flight": 4,
+            # Most packs opened for one pack step before re-planning
+            "max_packs": 8
         },
         "auto_trader": {
             "enabled": True,
-            "max_refresh_price": 10
+            "max_refresh_price": 10,
+            "max_concurrent_buys": 4,
+            "deal_history": 200,
+            "refresh_samples": 500
         }
     }
 }
\ No newline at end of file
@@ -0,0 +1,91 @@
+import numpy as np
+
+from models import Deal
+
+# Holos only ever come from packs or the trader
+HOLO_CARDS = range(81, 96)
+
+class DealHistory:
+    # Every deal the trader has offered us, kept as samples of what a refresh
+    # might bring: which holo a deal is for (smoothed frequencies, so holos we
+    # haven't been offered yet still count) and what its inputs would cost us.
+
+    def __init__(self, config):
+        trader_config = config["modules"]["auto_trader"]
+        self.size = trader_config.get("deal_history", 200)
+        self.samples = trader_config.get("refresh_samples", 500)
+        # id -> Deal, oldest first
+        self.deals = {}
+        # Deals per refreshed set, learnt from the first refresh
+        self.set_size = None
+        self.stats = {"refreshes": 0, "hits": 0, "spent": 0.0, "saved": 0.0}
+        self.rng = np.random.default_rng(config.get("session", {}).get("seed"))
+
+    def observe(self, deals):
+        for deal in deals:
+            if deal.id not in self.deals:
+                self.deals[deal.id] = deal
+        while len(self.deals) > self.size:
+            del self.deals[next(iter(self.deals))]
+
+    def holo_weights(self):
+        counts = np.ones(len(HOLO_CARDS))
+        for deal in self.deals.values():
+            if deal.holo_card.number in HOLO_CARDS:
+                counts[deal.holo_card.number - HOLO_CARDS.start] += 1
+        return counts / counts.sum()
+
+    def set_value(self, baseline, offers):
+        # What a set of (holo, trade cost) offers saves on the missing holos in
+        # `baseline` (holo -> cost without any deal); one deal per holo is enough
+        best = dict(baseline)
+        for holo, cost in offers:
+            if holo in best:
+                best[holo] = min(best[holo], cost)
+        return sum(baseline[holo] - best[holo] for holo in baseline)
+
+    def expected_value(self, baseline, trade_cost, set_size):
+        # Monte Carlo over random sets: holos drawn from the offer frequencies,
+        # input costs drawn from past deals priced against today's market
+        if not baseline or not self.deals:
+            return 0.0
+        costs = np.array([trade_cost(deal) for deal in self.deals.values()], dtype=float)
+        base = np.zeros(len(HOLO_CARDS))
+        for holo, cost in baseline.items():
+            base[holo - HOLO_CARDS.start] = cost
+        holos = self.rng.choice(len(HOLO_CARDS), size=(self.samples, set_size), p=self.holo_weights())
+        savings = np.maximum(0, base[holos] - self.rng.choice(costs, size=(self.samples, set_size)))
+        best = np.zeros((self.samples, len(HOLO_CARDS)))
+        np.maximum.at(best, (np.arange(self.samples)[:, None], holos), savings)
+        return float(best.sum(axis=1).mean())
+
+    def record_refresh(self, deals, price, saved):
+        self.stats["refreshes"] += 1
+        self.stats["spent"] += price
+        self.stats["saved"] += saved
+        if saved > 0:
+            self.stats["hits"] += 1
+        self.set_size = len(deals)
+        self.observe(deals)
+
+    def snapshot(self):
+        return {
+            "deals": [deal.to_json() for deal in self.deals.values()],
+            "set_size": self.set_size,
+            "stats": self.stats,
+        }
+
+    def restore(self, snapshot):
+        if not snapshot:
+            return False
+        self.observe(Deal.from_json(deal) for deal in snapshot["deals"])
+        self.set_size = snapshot.get("set_size")
+        self.stats.update(snapshot.get("stats", {}))
+        return True
+
+    def summary(self):
+        refreshes = self.stats["refreshes"]
+        if not refreshes:
+            return f"{len(self.deals)} deals seen, no refreshes"
+        return (f"{len(self.deals)} deals seen, {refreshes} refreshes, {self.stats['hits'] / refreshes:.0%} hit rate, "
+                f"${self.stats['saved'] / refreshes:.2f} saved per ${self.stats['spent'] / refreshes:.2f} refresh")
@@ -0,0 +1,151 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {level: name for name, level in LEVELS.items()}
+
+class EventLog:
+    # Structured log for the hot paths. A call only puts a tuple on a queue; a
+    # background thread fills in the message (a str.format template over the
+    # record's fields), prints it and appends the record as a JSON line to a
+    # rotating file. Debug records are rate limited per event: past
+    # `debug_rate` a second, one in `debug_sample` gets through, and none do
+    # while the writer is `max_queue` records behind.
+
+    def __init__(self, config):
+        log_config = config.get("log", {})
+        self.console_level = LEVELS[log_config.get("console_level", "info")]
+        self.file_level = LEVELS[log_config.get("file_level", "debug")]
+        self.path = log_config.get("path")
+        self.max_bytes = log_config.get("max_bytes", 5_000_000)
+        self.backups = log_config.get("backups", 3)
+        self.debug_rate = log_config.get("debug_rate", 20)
+        self.debug_sample = log_config.get("debug_sample", 10)
+        self.max_queue = log_config.get("max_queue", 10000)
+        # Anything below every sink's level is dropped before it is queued
+        self.level = min(self.console_level, self.file_level) if self.path else self.console_level
+        self.cycle = 0
+        self.stats = {"logged": 0, "sampled_out": 0, "dropped": 0, "errors": 0}
+        # event -> [window start, records in the window]
+        self._debug_windows = {}
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._thread = threading.Thread(target=self._drain, name="event-log", daemon=True)
+        self._thread.start()
+
+    def new_cycle(self):
+        self.cycle += 1
+        return self.cycle
+
+    def debug(self, event, message, **fields):
+        if self.level <= DEBUG and self._admit_debug(event):
+            self._put(DEBUG, event, message, fields)
+
+    def info(self, event, message, **fields):
+        if self.level <= INFO:
+            self._put(INFO, event, message, fields)
+
+    def warning(self, event, message, **fields):
+        if self.level <= WARNING:
+            self._put(WARNING, event, message, fields)
+
+    def error(self, event, message, **fields):
+        self._put(ERROR, event, message, fields)
+
+    def _put(self, level, event, message, fields):
+        self.stats["logged"] += 1
+        self._queue.put((time.time(), level, event, message, self.cycle, fields))
+
+    def _admit_debug(self, event):
+        if self._queue.qsize() > self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+        now = time.monotonic()
+        window = self._debug_windows.get(event)
+        if window is None or now - window[0] >= 1:
+            window = self._debug_windows[event] = [now, 0]
+        window[1] += 1
+        if window[1] <= self.debug_rate or (window[1] - self.debug_rate) % self.debug_sample == 0:
+            return True
+        self.stats["sampled_out"] += 1
+        return False
+
+    # Writer thread
+
+    def _drain(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            if isinstance(record, threading.Event):
+                record.set()
+                continue
+            try:
+                self._write(record)
+                if self._file is not None and self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                self.stats["errors"] += 1
+                sys.stderr.write(f"⚠️ Couldn't write log record: {e}\n")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record):
+        at, level, event, message, cycle, fields = record
+        try:
+            text = message.format(**fields)
+        except Exception:
+            # A template that doesn't fit its fields (a missing one, a None
+            # under a number format) still gets its record written
+            text = message
+        if level >= self.console_level:
+            # Looked up on every write, so redirected stdout is honoured
+            sys.stdout.write(text + "\n")
+        if self.path and level >= self.file_level:
+            line = json.dumps({"ts": round(at, 3), "level": LEVEL_NAMES[level], "event": event, "cycle": cycle,
+                               "msg": text, **fields}, default=str, ensure_ascii=False)
+            self._append(line)
+
+    def _append(self, line):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line + "\n")
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # bot.log -> bot.log.1 -> ... -> bot.log.{backups}, the oldest falls off
+        self._file.close()
+        self._file = None
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    # Lifecycle
+
+    def flush(self, timeout=5):
+        # Waits until everything queued so far has been written
+        if not self._thread.is_alive():
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait(timeout)
+
+    def close(self, timeout=5):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def summary(self):
+        return (f"{self.stats['logged']} records, {self.stats['sampled_out']} debug sampled out, "
+                f"{self.stats['dropped']} dropped behind a slow writer")
@@ -0,0 +1,101 @@
+import time
+from models import CardCounts
+from request_policy import failed
+
+class Inventory:
+    def __init__(self, api_client):
+        self.api_client = api_client
+        self.balance = None
+        self.cards = CardCounts()
+        self.last_sync = None
+        self.stale = True
+        self.stats = {"refreshes": 0, "refreshes_avoided": 0, "mismatches": 0, "deltas": 0}
+
+    def sync(self, balance, cards):
+        self.balance = balance
+        self.cards = cards.copy()
+        self.last_sync = time.monotonic()
+        self.stale = False
+
+    def restore(self, snapshot):
+        # Good enough to plan with straight away, but verified before we trust it
+        if snapshot and snapshot.get("balance") is not None:
+            self.sync(snapshot["balance"], CardCounts.from_json(snapshot["cards"]))
+            self.stale = True
+
+    def snapshot(self):
+        return {"balance": self.balance, "cards": self.cards.to_json()}
+
+    def mark_stale(self):
+        self.stale = True
+
+    def needs_reconcile(self):
+        interval = self.api_client.config.get("inventory", {}).get("reconcile_interval", 300)
+        return self.stale or self.last_sync is None or time.monotonic() - self.last_sync >= interval
+
+    async def reconcile(self, force=False):
+        if not force and not self.needs_reconcile():
+            self.stats["refreshes_avoided"] += 1
+            return True
+        user_info = await self.api_client.get_user_info()
+        if failed(user_info):
+            return False
+        balance, cards = user_info
+        self.stats["refreshes"] += 1
+        if self.last_sync is not None and not self._matches(balance, cards):
+            self.stats["mismatches"] += 1
+            self.api_client.log.warning("inventory_drift", "🔁 Inventory drifted from server, resynced (local ${local:.2f}, server ${server:.2f})",
+                                        local=self.balance, server=balance)
+        self.sync(balance, cards)
+        return True
+
+    def _matches(self, balance, cards):
+        if self.balance is None or abs(self.balance - balance) > 1e-6:
+            return False
+        return self.cards.matches(cards)
+
+    def apply_claim(self, status):
+        if 'cards' in status:
+            self.sync(status['balance'], status['cards'])
+
+    def apply_pack(self, balance, cards, pack_price):
+        # The pack response is authoritative, but if it disagrees with what the
+        # local balance predicted, something happened behind our back
+        if self.balance is not None and abs(self.balance - pack_price - balance) > 1e-6:
+            self.stats["mismatches"] += 1
+        self.sync(balance, cards)
+
+    def merge_pack(self, balance, cards, pack_price):
+        # Packs opened concurrently can answer out of order. Packs only ever
+        # add cards, so the most copies of each card are the newest state,
+        # whichever answer they came with. No answer's balance can be trusted
+        # the same way, a claim may land between two of them, so each pack
+        # just takes its price off ours; the caller reconciles once the batch
+        # is done.
+        if self.stale or self.balance is None:
+            self.sync(balance, cards)
+            return
+        self.stats["deltas"] += 1
+        self.balance -= pack_price
+        self.cards = self.cards.union(cards)
+
+    def apply_buy(self, card_number, quantity, total_cost):
+        self.stats["deltas"] += 1
+        self.balance -= total_cost
+        self.cards.add(card_number, quantity)
+
+    def apply_spend(self, amount):
+        # Paid for something that isn't a card; the server has the exact price
+        self.stats["deltas"] += 1
+        self.balance -= amount
+        self.stale = True
+
+    def apply_trade(self, deal):
+        self.stats["deltas"] += 1
+        self.cards.add(deal.holo_card.number, 1)
+        for card, quantity in deal.regular_cards:
+            self.cards.add(card.number, -quantity)
+
+    def summary(self):
+        return (f"{self.stats['refreshes']} refreshes, {self.stats['refreshes_avoided']} avoided, "
+                f"{self.stats['deltas']} local deltas, {self.stats['mismatches']} mismatches")
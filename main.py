@@ -1,158 +1,369 @@
 import asyncio
+import time
 import traceback
 from config import CONFIG
 from api_client import APIClient
 from card_manager import CardManager
+from deal_history import DealHistory
+from inventory import Inventory
+from market_book import MarketBook
+from market_tracker import MarketTracker, Watchlist
+from phase_timer import PhaseTimer
+from planner import CollectionPlanner, SPECIAL_CARDS
+from price_history import PriceHistory
+from profiler import Profiler
+from request_policy import RequestFailed, failed
+from scheduler import Scheduler
+from timeline import IncomeModel, TimelinePlanner, format_duration
 from modules.auto_complete_collection import auto_complete_collection
 from modules.auto_pack_opener import auto_pack_opener
 from modules.auto_trader import (
-    auto_trader, calculate_cheapest_acquisition, get_trader_deals,
+    auto_trader, get_trader_deals, maybe_refresh_deals,
     buy_from_market, execute_trade_strategy, open_packs_strategy
 )
 
 async def main_loop():
     api_client = APIClient(CONFIG)
+    try:
+        await run_bot(api_client)
+    finally:
+        await api_client.close()
+
+async def run_bot(api_client):
+    startup = time.perf_counter()
+    ready_after = None
+    config = api_client.config
+    log = api_client.log
+    scheduler_config = config.get("scheduler", {})
     card_manager = CardManager(api_client)
+    inventory = Inventory(api_client)
+    planner = CollectionPlanner(config, card_manager.expected_pack_cost)
+    scheduler = Scheduler(config, log)
+    if api_client.replay is not None:
+        # Nothing left to answer with, so nothing left to do
+        api_client.replay.on_exhausted = scheduler.stop
+    # Held while we change what we own (acting, reconciling), so a server snapshot
+    # never lands in the middle of a local delta
+    acting = asyncio.Lock()
+    tracker = MarketTracker()
+    watchlist = Watchlist()
+    deal_history = DealHistory(config)
+    price_history = PriceHistory(config)
+    income = IncomeModel(config)
+    profiler = Profiler(config)
+    timeline = TimelinePlanner(card_manager.pack_model, income)
+    seen = {"deals": None}
+    api_client.state.track("inventory", inventory.snapshot)
+    api_client.state.track("pack_model", card_manager.pack_model.snapshot)
+    api_client.state.track("deal_history", deal_history.snapshot)
+    api_client.state.track("income", income.snapshot)
 
-    await api_client.get_bearer()
+    inventory.restore(api_client.state.get("inventory"))
+    deal_history.restore(api_client.state.get("deal_history"))
+    income.restore(api_client.state.get("income"))
+    if not api_client.restore_state():
+        await api_client.get_bearer()
+    api_client.start_token_refresher()
+    await api_client.metrics.serve()
     await card_manager.fetch_all_cards()
-    
-    while True:
-        try:
-            status = await api_client.claim()
-            if status is None:
-                print("🔄 Token refresh needed. Retrying...")
-                continue
-            if status['wait_time'] > 0:
-                print(f"⏳ Gotta wait {status['wait_time']}s for next claim")
-                await asyncio.sleep(status['wait_time'])
-                continue
-
-            balance, cards = await api_client.get_user_info()
-            if balance is None or cards is None:
-                print("❌ Couldn't get user info. Retrying...")
-                continue
-            
-            print(f"💰 Balance: ${balance:.2f}")
+
+    def wanted(card_number):
+        return not inventory.cards.owns(card_number)
+
+    async def claim_job(timer):
+        with PhaseTimer(profiler).phase("claim"):
+            await claim(timer)
+
+    async def claim(timer):
+        status = await api_client.claim()
+        if failed(status):
+            # The timer backs off; a made-up wait would just hide the outage
+            raise RuntimeError(f"claim failed: {status}")
+        if status['wait_time'] > 0:
+            income.observe_wait(status['wait_time'])
+            log.info("claim_wait", "⏳ Next claim in {wait:.1f}s", wait=status['wait_time'])
+            timer.schedule_in(status['wait_time'] + scheduler_config.get("claim_slack", 0.05))
+            return
+        if acting.locked():
+            # Can't tell whether the snapshot includes the action in flight
+            inventory.mark_stale()
+        else:
+            inventory.apply_claim(status)
+        income.observe_claim(status.get('reward'))
+        log.info("claim", "💰 Claimed! Balance: ${balance:.2f}", balance=status['balance'], reward=status.get('reward'))
+
+        calls = {}
+        for special_card in [97, 99, 100]:
+            if wanted(special_card):
+                log.info("special", "🔮 Trying to get special card {card}", card=special_card)
+                calls[f"special_{special_card}"] = (api_client.perform_special_action(special_card), None)
+                # Special actions may hand out cards we can't see locally
+                inventory.mark_stale()
+        # The claim response doesn't say when the next one is due
+        calls["status"] = (api_client.get_status(), RequestFailed("timed out"))
+        results, _ = await api_client.fan_out(calls)
+        if failed(results["status"]):
+            # Claiming early only costs a request, the server tells us how long to wait
+            timer.schedule_in(scheduler_config.get("error_delay", 1))
+        else:
+            income.observe_wait(results["status"]['wait_time'], after_claim=True)
+            timer.schedule_in(results["status"]['wait_time'] + scheduler_config.get("claim_slack", 0.05))
+        scheduler["plan"].fire_now()
+
+    async def market_job(timer):
+        listings = await api_client.get_market_listings(fresh=True)
+        if failed(listings):
+            # Diffing against nothing would look like every listing vanished
+            raise RuntimeError(f"market fetch failed: {listings}")
+        events = tracker.update(listings)
+        price_history.record(listings)
+        hits = watchlist.hits(events)
+        for event in hits:
+            log.info("watch_hit", "👀 Card {card} {change} at ${price:.2f} (watching for under ${target:.2f})",
+                     card=event['card'], change=event['type'], entry=event['listing'].id,
+                     price=event['listing'].price, target=watchlist.targets[event['card']])
+        timer.adapt(bool(hits))
+        # Listings for cards nobody is planning around don't need a new plan
+        if hits or watchlist.affected(tracker.pending):
+            scheduler["plan"].fire_now()
+
+    async def deals_job(timer):
+        deals = await api_client.get_trader_deals(fresh=True)
+        if failed(deals):
+            raise RuntimeError(f"deals fetch failed: {deals}")
+        deal_history.observe(deals)
+        ids = {deal.id for deal in deals}
+        if seen["deals"] is not None and ids != seen["deals"]:
+            fresh_targets = [d.holo_card.number for d in deals if d.id not in seen["deals"] and wanted(d.holo_card.number)]
+            if fresh_targets:
+                log.info("new_deals", "🤝 New deals for missing cards {cards}", cards=sorted(set(fresh_targets)))
+            timer.adapt(bool(fresh_targets))
+            scheduler["plan"].fire_now()
+        else:
+            timer.adapt(False)
+        seen["deals"] = ids
+
+    async def reconcile_job(timer):
+        # Only hits the server when the local inventory is due for a check
+        async with acting:
+            synced = await inventory.reconcile()
+        if not synced:
+            raise RuntimeError("couldn't get user info")
+        api_client.state.save()
+
+    async def plan_job(timer):
+        nonlocal ready_after
+        phases = PhaseTimer(profiler)
+        log.new_cycle()
+        async with acting:
+            with phases.phase("reconcile"):
+                synced = await inventory.reconcile()
+            if not synced or inventory.balance is None:
+                raise RuntimeError("couldn't get user info")
+            balance, cards = inventory.balance, inventory.cards
+
+            log.info("balance", "💰 Balance: ${balance:.2f}", balance=balance)
             missing_cards = card_manager.check_missing_cards(cards)
-            print(f"🃏 Missing: {missing_cards}")
-            
+            log.info("missing", "🃏 Missing: {cards}", cards=missing_cards)
             if not missing_cards:
-                print("🎉 Collection complete! We're done here!")
-                break
-
-            for special_card in [97, 99, 100]:
-                if special_card in missing_cards:
-                    print(f"🔮 Trying to get special card {special_card}")
-                    await api_client.perform_special_action(special_card)
-            
-            balance, cards = await api_client.get_user_info()
-            
-            # Plan actions for this cycle
-            action = await plan_action(api_client, card_manager, cards, balance)
-            
+                log.info("complete", "🎉 Collection complete! We're done here!")
+                scheduler.stop()
+                return
+
+            with phases.phase("fetch"):
+                # Served from what the market and deal timers last fetched
+                results, timings = await api_client.fan_out({
+                    "deals": (get_trader_deals(api_client), RequestFailed("timed out")),
+                    "market": (api_client.get_market_listings(), RequestFailed("timed out")),
+                })
+            phases.record_details("fetch", timings)
+            for name in ("market", "deals"):
+                if failed(results[name]):
+                    # No data isn't an empty market; planning on it would misjudge every card
+                    raise RuntimeError(f"{name} fetch failed: {results[name]}")
+
+            with phases.phase("plan"):
+                tracker.update(results["market"])
+                market_book = MarketBook(results["market"])
+                deal_history.observe(results["deals"])
+                deals = await maybe_refresh_deals(api_client, card_manager, inventory, results["deals"], market_book, deal_history)
+                action = await plan_action(api_client, card_manager, planner, cards, inventory.balance, deals, market_book,
+                                           watchlist=watchlist, changed_cards=tracker.take_changed(), timeline=timeline,
+                                           price_history=price_history)
+                api_client.market_watch = set(watchlist.targets)
+            if ready_after is None:
+                ready_after = time.perf_counter() - startup
+                api_client.metrics.observe_startup(ready_after, api_client.state.loaded)
+                log.info("ready", "🚀 {start} start: first action decided {seconds:.2f}s after launch",
+                         start='Warm' if api_client.state.loaded else 'Cold', seconds=ready_after)
+
             if not action:
-                print("Saving money for future actions. Waiting for next cycle...")
+                log.info("saving", "Saving money for future actions. Waiting for the next claim or market change...")
             else:
-                print(f"📝 Strategy for this turn: {action['type'].capitalize()} for card {action['card']}")
-                
+                log.info("action", "📝 Strategy for this turn: {method} for card {card}",
+                         method=action['type'].capitalize(), card=action['card'], cost=action['cost'])
                 try:
-                    if action['type'] == 'market':
-                        success, balance, cards = await buy_from_market(api_client, action['card'], action['entry_id'], balance, cards)
-                    elif action['type'] == 'trade':
-                        success, balance, cards = await execute_trade_strategy(api_client, card_manager, action['deal'], balance, cards)
-                    elif action['type'] == 'pack':
-                        success, balance, cards = await open_packs_strategy(api_client, card_manager, action['card'], balance, cards)
-
+                    with phases.phase("execute"):
+                        success = await execute_action(api_client, card_manager, inventory, action, market_book)
                     if success:
-                        print(f"✅ Action successful: {action['type']} for card {action['card']}")
+                        log.info("action_done", "✅ Action successful: {method} for card {card}", method=action['type'], card=action['card'])
                     else:
-                        print(f"❌ Action failed: {action['type']} for card {action['card']}")
+                        log.warning("action_failed", "❌ Action failed: {method} for card {card}", method=action['type'], card=action['card'])
                 except Exception as e:
-                    print(f"😱 Error in {action['type']} for card {action['card']}: {str(e)}")
-                    print("Traceback:")
-                    traceback.print_exc()
-
-            # Refresh user info after action
-            balance, cards = await api_client.get_user_info()
-            if balance is None or cards is None:
-                print("❌ Couldn't get updated user info. Continuing...")
+                    log.error("action_error", "😱 Error in {method} for card {card}: {error}\nTraceback:\n{traceback}",
+                              method=action['type'], card=action['card'], error=str(e), traceback=traceback.format_exc().rstrip())
+
+            with phases.phase("refresh"):
+                synced = await inventory.reconcile()
+            if not synced:
+                log.warning("refresh_failed", "❌ Couldn't get updated user info. Continuing...")
             else:
-                print(f"💰 Updated Balance: ${balance:.2f}")
-                missing_cards = card_manager.check_missing_cards(cards)
-                print(f"🃏 Still Missing: {missing_cards}")
-
-            print("😴 Taking a breather...")
-            await asyncio.sleep(1)
-        except Exception as e:
-            print(f"😱 Oops! Something went wrong in main loop: {str(e)}")
-            print("Traceback:")
-            traceback.print_exc()
-            print("🛌 Gonna nap for a minute...")
-            await asyncio.sleep(60)
-
-async def plan_action(api_client, card_manager, cards, balance):
+                log.info("balance", "💰 Updated Balance: ${balance:.2f}", balance=inventory.balance)
+                log.info("missing", "🃏 Still Missing: {cards}", cards=card_manager.check_missing_cards(inventory.cards))
+
+        # Claims land before the balance is read, so any drop is spending
+        api_client.metrics.observe_cycle(
+            phases,
+            coins_spent=max(0, balance - (inventory.balance or 0)),
+            cards_acquired=max(0, len(missing_cards) - len(card_manager.check_missing_cards(inventory.cards))),
+        )
+        api_client.metrics.on_cycle_end()
+        profiler.cycle_end()
+        log.info("cycle", "⏱️ Cycle: {summary}", summary=phases.summary())
+        log.info("cache", "📦 Cache: {summary}", summary=api_client.cache_summary())
+        log.info("requests", "🚦 Requests: {summary}", summary=api_client.policy.summary())
+        log.info("market", "📈 Market: {summary}, {searched} plans searched, {reused} reused",
+                 summary=tracker.summary(), searched=planner.stats['searched'], reused=planner.stats['reused'])
+        log.info("inventory", "🗃️ Inventory: {summary}", summary=inventory.summary())
+        log.info("deals", "🔀 Deals: {summary}", summary=deal_history.summary())
+        log.info("prices", "📉 Prices: {summary}", summary=price_history.summary())
+        log.info("timers", "⏰ Timers: {summary}", summary=scheduler.summary())
+        log.info("log", "📝 Log: {summary}", summary=log.summary())
+
+    scheduler.add("claim", claim_job, 0)
+    scheduler.add("market", market_job, scheduler_config.get("market_interval", 2), scheduler_config.get("market_max_interval", 30))
+    scheduler.add("deals", deals_job, scheduler_config.get("deals_interval", 5), scheduler_config.get("deals_max_interval", 60))
+    scheduler.add("reconcile", reconcile_job, scheduler_config.get("reconcile_interval", 10))
+    scheduler.add("plan", plan_job, scheduler_config.get("plan_interval", 15))
+
+    # Everything the first plan needs, fetched at once; the pollers take over from here
+    results, _ = await api_client.fan_out({
+        "market": (api_client.get_market_listings(), RequestFailed("timed out")),
+        "deals": (get_trader_deals(api_client), RequestFailed("timed out")),
+        "inventory": (inventory.reconcile(), False),
+    })
+    if not failed(results["market"]):
+        tracker.update(results["market"])
+        price_history.record(results["market"])
+    if not failed(results["deals"]):
+        seen["deals"] = {deal.id for deal in results["deals"]}
+        deal_history.observe(results["deals"])
+    for name in ("market", "deals", "reconcile"):
+        scheduler[name].schedule_in(scheduler[name].interval)
+    profiler.start()
+    try:
+        await scheduler.run()
+    finally:
+        # Whatever is still queued goes out before the profile summary
+        log.flush()
+        price_history.close()
+        await profiler.stop()
+
+async def execute_action(api_client, card_manager, inventory, action, market_book):
+    if action['type'] == 'market':
+        return await buy_from_market(api_client, inventory, action['card'], action['entry_id'], market_book=market_book)
+    elif action['type'] == 'trade':
+        return await execute_trade_strategy(api_client, card_manager, inventory, action['deal'], market_book, budget=action['cost'])
+    return await open_packs_strategy(api_client, card_manager, inventory, action['card'], action['cards'])
+
+async def plan_action(api_client, card_manager, planner, cards, balance, deals, market_book, watchlist=None, changed_cards=None, timeline=None,
+                      price_history=None):
+    log = api_client.log
     missing_cards = card_manager.check_missing_cards(cards)
-    deals = await get_trader_deals(api_client)
-    market_listings = await api_client.get_market_listings()
-    
-    actions = []
-
-    for card_number in missing_cards:
-        if 96 <= card_number <= 100:
-            continue  # Skip special cards
-
-        cost, method = await calculate_cheapest_acquisition(api_client, card_manager, card_number, deals, market_listings, cards, balance)
-        
-        action = {
-            'type': method,
-            'card': card_number,
-            'cost': cost
-        }
-        
-        if method == 'market':
-            listing = next((l for l in market_listings if l['card']['number'] == card_number), None)
-            if listing:
-                action['entry_id'] = listing['id']
-            else:
-                continue
-        elif method == 'trade':
-            deal = next((d for d in deals if d['holo_card']['number'] == card_number), None)
-            if deal:
-                action['deal'] = deal
-            else:
-                continue
-        
-        actions.append(action)
+    # Off the event loop, so a re-simulated pack model doesn't hold up a due claim
+    plan = await asyncio.to_thread(planner.plan, missing_cards, market_book, deals, cards, changed_cards)
+    log.info("plan", "🧭 Plan: {summary}", summary=plan.summary(), steps=len(plan.steps))
 
-    # Sort actions by cost
-    actions.sort(key=lambda x: x['cost'])
+    # A pack is worth what the missing cards it yields would cost us otherwise
+    pack_targets = [card_number for card_number in missing_cards if card_number not in SPECIAL_CARDS]
+    card_values = {
+        card_number: card_manager.calculate_card_acquisition_efficiency(card_number, market_book.cheapest_price(card_number))[1]
+        for card_number in pack_targets
+    }
+    marginal_value, completion_cost = card_manager.pack_outlook(pack_targets, card_values)
+    log.info("pack_outlook", "🎲 Next pack is worth ${value}, finishing by packs alone costs ${cost}",
+             value=marginal_value, cost=completion_cost)
+
+    if watchlist is not None:
+        # Anything listed below what a card costs us now is worth a look, as is a
+        # cheaper input for a deal that would get us a missing holo
+        targets = dict(card_values)
+        for deal in deals:
+            if deal.holo_card.number in missing_cards:
+                for card, _ in deal.regular_cards:
+                    targets.setdefault(card.number, market_book.cheapest_price(card.number))
+        watchlist.update(targets)
+
+    # Every step of the plan has to happen eventually. Without an income model,
+    # start with the cheapest; with one, with whatever finishes the collection
+    # soonest. Packs are bought one at a time, so they only need one pack's worth.
+    pack_price = api_client.config["modules"]["auto_pack_opener"]["pack_price"]
+    actions = sorted(plan.steps, key=lambda step: pack_price if step['type'] == 'pack' else step['cost'])
+    if timeline is not None and actions:
+        forecast = timeline.forecast(plan, balance, pack_price)
+        api_client.metrics.observe_eta(forecast.eta)
+        log.info("forecast", "⏳ Completion: {summary}", summary=forecast.summary(), eta=forecast.eta)
+        # Best first, so the next one takes over if the best has to wait
+        actions = [step for step, _ in forecast.candidates]
+    if price_history is not None:
+        # A step listed well over its usual price waits and the next best goes
+        # ahead. The plan keeps it, so a card that got dearer for good is bought
+        # once its rolling median has caught up.
+        spiked = [step for step in actions if step['type'] == 'market' and price_history.is_spike(step['card'], step['cost'])]
+        for step in spiked:
+            log.info("price_spike", "📈 Card {card} is listed at ${price:.2f}, well over its usual ${median:.2f}. "
+                     "Skipping it until the price comes back", card=step['card'], entry=step['entry_id'],
+                     price=step['cost'], median=price_history.median(step['card']))
+        actions = [step for step in actions if step not in spiked]
 
     if actions:
         cheapest_action = actions[0]
-        pack_price = api_client.config["modules"]["auto_pack_opener"]["pack_price"]
 
         if cheapest_action['type'] == 'pack' and balance >= pack_price:
-            print(f"Best approach: Open packs for card {cheapest_action['card']}")
-            print(f"  Estimated total cost: ${cheapest_action['cost']:.2f}")
-            print(f"  Opening a pack for ${pack_price:.2f}")
-            return {'type': 'pack', 'card': cheapest_action['card'], 'cost': pack_price}
+            log.info("choice", "Best approach: Open packs for cards {cards}\n  Estimated total cost: ${cost:.2f}\n"
+                     "  Opening a pack for ${price:.2f}", method='pack', cards=cheapest_action['cards'],
+                     cost=cheapest_action['cost'], price=pack_price)
+            return {'type': 'pack', 'card': cheapest_action['card'], 'cards': cheapest_action['cards'], 'cost': pack_price}
         elif cheapest_action['cost'] <= balance:
-            print(f"Best approach to get card {cheapest_action['card']}:")
-            print(f"  Method: {cheapest_action['type']}")
-            print(f"  Estimated cost: ${cheapest_action['cost']:.2f}")
+            log.info("choice", "Best approach to get card {card}:\n  Method: {method}\n  Estimated cost: ${cost:.2f}",
+                     card=cheapest_action['card'], method=cheapest_action['type'], cost=cheapest_action['cost'])
             return cheapest_action
         else:
-            next_target_cost = cheapest_action['cost']
-            print(f"Saving up for next cheapest action:")
-            print(f"  Card: {cheapest_action['card']}")
-            print(f"  Method: {cheapest_action['type']}")
-            print(f"  Target cost: ${next_target_cost:.2f}")
-            print(f"  Current balance: ${balance:.2f}")
-            print(f"  Need to save: ${next_target_cost - balance:.2f}")
+            next_target_cost = pack_price if cheapest_action['type'] == 'pack' else cheapest_action['cost']
+            message = ("Saving up for next cheapest action:\n  Card: {card}\n  Method: {method}\n  Target cost: ${target:.2f}\n"
+                       "  Current balance: ${balance:.2f}\n  Need to save: ${need:.2f}")
+            fields = {"card": cheapest_action['card'], "method": cheapest_action['type'], "target": next_target_cost,
+                      "balance": balance, "need": next_target_cost - balance}
+            if timeline is not None and timeline.income.known():
+                message += "\n  Affordable in: ~{wait}"
+                fields["wait"] = format_duration(float(timeline.income.time_to_afford(balance, [next_target_cost])[0]))
+            log.info("saving_up", message, **fields)
+            if price_history is not None:
+                # Every step has to happen anyway; one listed at a price the card
+                # rarely goes for is worth taking before it's gone
+                bargain = next((step for step in plan.steps if step['type'] == 'market' and step['cost'] <= balance
+                                and price_history.is_bargain(step['card'], step['cost'])), None)
+                if bargain is not None:
+                    log.info("price_bargain", "🏷️ Card {card} is listed at ${price:.2f}, under its usual ${median:.2f}. "
+                             "Buying it while saving up", card=bargain['card'], entry=bargain['entry_id'],
+                             price=bargain['cost'], median=price_history.median(bargain['card']))
+                    return bargain
             return None  # Return None to indicate we're saving money
+    elif plan.steps:
+        log.info("no_action", "Every step left is waiting for its price to come back.")
+        return None
     else:
-        print("No viable actions found for any missing cards.")
+        log.info("no_action", "No viable actions found for any missing cards.")
         return None
 
     return None  # If we reach here, we're saving money
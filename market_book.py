@@ -0,0 +1,75 @@
+from bisect import bisect_left
+
+class MarketBook:
+    def __init__(self, listings):
+        self.listings = listings
+        self.by_id = {}
+        self.by_card = {}
+        for listing in listings:
+            self.by_id[listing.id] = listing
+            self.by_card.setdefault(listing.card.number, []).append(listing)
+
+        # Per card: listings sorted by price plus running totals of units and cost,
+        # so the price of the first N units is a binary search away
+        self._cumulative_quantity = {}
+        self._cumulative_cost = {}
+        for card_number, card_listings in self.by_card.items():
+            card_listings.sort(key=lambda l: l.price)
+            quantities, costs = [], []
+            total_quantity, total_cost = 0, 0
+            for listing in card_listings:
+                total_quantity += listing.quantity
+                total_cost += listing.price * listing.quantity
+                quantities.append(total_quantity)
+                costs.append(total_cost)
+            self._cumulative_quantity[card_number] = quantities
+            self._cumulative_cost[card_number] = costs
+
+    def __len__(self):
+        return len(self.listings)
+
+    def __contains__(self, card_number):
+        return card_number in self.by_card
+
+    def get(self, entry_id):
+        return self.by_id.get(entry_id)
+
+    def listings_for(self, card_number):
+        return self.by_card.get(card_number, [])
+
+    def cheapest(self, card_number):
+        listings = self.by_card.get(card_number)
+        return listings[0] if listings else None
+
+    def cheapest_price(self, card_number):
+        listing = self.cheapest(card_number)
+        return listing.price if listing else float('inf')
+
+    def depth(self, card_number):
+        quantities = self._cumulative_quantity.get(card_number)
+        return quantities[-1] if quantities else 0
+
+    def fill(self, card_number, quantity):
+        # (listing, units) pairs that buy `quantity` units cheapest first; comes up
+        # short when the book isn't deep enough
+        fills = []
+        for listing in self.by_card.get(card_number, []):
+            if quantity <= 0:
+                break
+            take = min(quantity, listing.quantity)
+            fills.append((listing, take))
+            quantity -= take
+        return fills
+
+    def cost_for(self, card_number, quantity):
+        if quantity <= 0:
+            return 0
+        quantities = self._cumulative_quantity.get(card_number)
+        if not quantities or quantities[-1] < quantity:
+            return float('inf')
+        index = bisect_left(quantities, quantity)
+        listing = self.by_card[card_number][index]
+        # Everything before `index` is bought out, the rest comes from this listing
+        bought_before = quantities[index - 1] if index else 0
+        cost_before = self._cumulative_cost[card_number][index - 1] if index else 0
+        return cost_before + (quantity - bought_before) * listing.price
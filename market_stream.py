@@ -0,0 +1,85 @@
+import codecs
+import heapq
+import json
+import re
+
+from models import Listing
+
+SEPARATORS = re.compile(r"[\s,]*")
+
+class MarketStreamParser:
+    # Incremental parser for the /market/all body ({"entries": [...]}). Bytes are
+    # fed as they arrive; every complete entry object is decoded on its own and
+    # only the `top_k` cheapest listings per card are kept, plus every listing of
+    # a `watched` card. Nothing but the unparsed tail of the body is buffered.
+
+    def __init__(self, top_k, watched=()):
+        self.top_k = top_k
+        self.watched = set(watched)
+        self.seen = 0
+        self.found = False
+        self.done = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        # card -> heap of (-price, -id, listing), so the priciest is popped first
+        self._cheapest = {}
+        self._watched_listings = []
+
+    def feed(self, chunk):
+        self._buffer += self._decoder.decode(chunk)
+        if not self.found:
+            start = self._buffer.find('"entries"')
+            if start < 0:
+                # Keep enough of the tail for a key split across chunks
+                self._buffer = self._buffer[-(len('"entries"') - 1):]
+                return
+            bracket = self._buffer.find("[", start)
+            if bracket < 0:
+                # The key is in, its list hasn't started yet
+                self._buffer = self._buffer[start:]
+                return
+            self.found = True
+            self._buffer = self._buffer[bracket + 1:]
+
+        buffer, pos = self._buffer, 0
+        while not self.done:
+            pos = SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                entry, end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Only part of the next entry is here yet
+                break
+            self._keep(entry)
+            pos = end
+        self._buffer = buffer[pos:]
+
+    def _keep(self, entry):
+        self.seen += 1
+        card_number = entry['card']['number']
+        if card_number in self.watched:
+            self._watched_listings.append(Listing.from_json(entry))
+            return
+        heap = self._cheapest.setdefault(card_number, [])
+        rank = (-entry['price'], -entry['id'])
+        # Entries that wouldn't make the cut never become models
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, (*rank, Listing.from_json(entry)))
+        elif rank > heap[0][:2]:
+            heapq.heapreplace(heap, (*rank, Listing.from_json(entry)))
+
+    def result(self):
+        if not self.done:
+            raise ValueError(f"market response ended before the entries list ({self.seen} entries parsed)")
+        listings = list(self._watched_listings)
+        for heap in self._cheapest.values():
+            listings.extend(item[2] for item in heap)
+        return listings
+
+    def kept(self):
+        return len(self._watched_listings) + sum(len(heap) for heap in self._cheapest.values())
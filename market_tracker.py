@@ -0,0 +1,75 @@
+class MarketTracker:
+    # Diffs consecutive /market/all snapshots by entry id. Every difference is an
+    # event dict: {'type': 'added'|'removed'|'repriced'|'resized', 'card': n,
+    # 'listing': current (or removed) listing, 'old': previous listing or None}.
+    # Cards touched since the last take_changed() accumulate in `pending`.
+
+    def __init__(self):
+        self.listings = None
+        self.pending = None
+        self.stats = {"snapshots": 0, "unchanged": 0, "events": 0}
+
+    def update(self, listings):
+        current = {listing.id: listing for listing in listings}
+        self.stats["snapshots"] += 1
+        if self.listings is None:
+            self.listings = current
+            return []
+
+        events = []
+        for entry_id, listing in current.items():
+            old = self.listings.get(entry_id)
+            if old is None:
+                events.append({'type': 'added', 'card': listing.card.number, 'listing': listing, 'old': None})
+            elif old.price != listing.price:
+                events.append({'type': 'repriced', 'card': listing.card.number, 'listing': listing, 'old': old})
+            elif old.quantity != listing.quantity:
+                events.append({'type': 'resized', 'card': listing.card.number, 'listing': listing, 'old': old})
+        for entry_id, old in self.listings.items():
+            if entry_id not in current:
+                events.append({'type': 'removed', 'card': old.card.number, 'listing': old, 'old': old})
+
+        self.listings = current
+        self.stats["events"] += len(events)
+        if not events:
+            self.stats["unchanged"] += 1
+        if self.pending is not None:
+            self.pending.update(event['card'] for event in events)
+        return events
+
+    def take_changed(self):
+        # Cards whose listings changed since the last call, or None when there's
+        # no earlier snapshot to compare with and everything counts as changed
+        changed, self.pending = self.pending, set()
+        return changed
+
+    def summary(self):
+        return (f"{self.stats['snapshots']} snapshots, {self.stats['unchanged']} unchanged, "
+                f"{self.stats['events']} listing events")
+
+class Watchlist:
+    # Cards we'd buy given a good enough price: missing cards below what they'd
+    # cost us another way, and the regular inputs of deals for missing holos
+    # below their current cheapest listing.
+
+    def __init__(self):
+        self.targets = {}
+
+    def update(self, targets):
+        self.targets = dict(targets)
+
+    def __contains__(self, card_number):
+        return card_number in self.targets
+
+    def affected(self, card_numbers):
+        return card_numbers is None or any(card_number in self.targets for card_number in card_numbers)
+
+    def hits(self, events):
+        hits = []
+        for event in events:
+            if event['type'] not in ('added', 'repriced'):
+                continue
+            target = self.targets.get(event['card'])
+            if target is not None and event['listing'].price < target:
+                hits.append(event)
+        return hits
@@ -0,0 +1,210 @@
+import asyncio
+import bisect
+import os
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def error_category(status_code):
+    if status_code == 401:
+        return "auth"
+    if status_code == 429:
+        return "throttled"
+    if status_code >= 500:
+        return "server"
+    if status_code >= 400:
+        return "client"
+    return None
+
+def label_text(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, good enough to
+        # tell a 20ms endpoint from a 2s one
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class Metrics:
+    # Everything is plain dict/list bookkeeping on the event loop thread, so
+    # recording costs a bisect and a few dict updates per request
+
+    def __init__(self, config, log):
+        self.config = config.get("metrics", {})
+        self.log = log
+        self.latency = {}
+        self.statuses = {}
+        self.errors = {}
+        self.retries = {}
+        self.bytes = {}
+        self.phases = {}
+        self.cycles = 0
+        self.coins_spent = 0.0
+        self.cards_acquired = 0
+        self.startup = None
+        self.completion_eta = None
+        self.packs = {"opened": 0, "overshoot": 0, "seconds": 0.0}
+        self._server = None
+
+    def observe_request(self, endpoint, seconds, status_code=None, sent=0, received=0, error=None):
+        self.latency.setdefault(endpoint, Histogram()).observe(seconds)
+        if status_code is not None:
+            key = (endpoint, status_code)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            error = error or error_category(status_code)
+        if error:
+            key = (endpoint, error)
+            self.errors[key] = self.errors.get(key, 0) + 1
+        for direction, count in (("sent", sent), ("received", received)):
+            key = (endpoint, direction)
+            self.bytes[key] = self.bytes.get(key, 0) + count
+
+    def observe_retry(self, endpoint):
+        self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def observe_cycle(self, timer, coins_spent=0, cards_acquired=0):
+        self.cycles += 1
+        for name, seconds in timer.phases.items():
+            self.phases.setdefault(name, Histogram()).observe(seconds)
+        self.coins_spent += coins_spent
+        self.cards_acquired += cards_acquired
+
+    def observe_startup(self, seconds, warm):
+        self.startup = (seconds, "warm" if warm else "cold")
+
+    def observe_eta(self, seconds):
+        self.completion_eta = seconds
+
+    def observe_packs(self, opened, overshoot, seconds):
+        self.packs["opened"] += opened
+        self.packs["overshoot"] += overshoot
+        self.packs["seconds"] += seconds
+
+    def coins_per_card(self):
+        return self.coins_spent / self.cards_acquired if self.cards_acquired else 0.0
+
+    def render(self):
+        lines = []
+
+        def histogram(name, help_text, label, histograms):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_text([(label, key), ("le", bound)])}}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_text([(label, key)])}}} {hist.sum:.6f}')
+                lines.append(f'{name}_count{{{label_text([(label, key)])}}} {hist.count}')
+
+        def counter(name, help_text, labels, values):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{name}{{{label_text(zip(labels, key))}}} {value}")
+
+        def gauge(name, help_text, kind, value):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+
+        histogram("tpot_request_duration_seconds", "Backend request latency.", "endpoint", self.latency)
+        counter("tpot_requests_total", "Backend responses by status code.", ("endpoint", "status"), self.statuses)
+        counter("tpot_request_errors_total", "Failed backend requests by category.", ("endpoint", "category"), self.errors)
+        counter("tpot_request_retries_total", "Requests sent again after a rejected token or a transient failure.", ("endpoint",), self.retries)
+        counter("tpot_request_bytes_total", "Request and response body bytes.", ("endpoint", "direction"), self.bytes)
+        histogram("tpot_cycle_phase_seconds", "Time spent in each main loop phase.", "phase", self.phases)
+        if self.startup is not None:
+            lines.append("# HELP tpot_startup_seconds Launch to first action decision, by cold or warm start.")
+            lines.append("# TYPE tpot_startup_seconds gauge")
+            lines.append(f'tpot_startup_seconds{{{label_text([("start", self.startup[1])])}}} {self.startup[0]:.4f}')
+        gauge("tpot_cycles_total", "Completed main loop cycles.", "counter", self.cycles)
+        gauge("tpot_coins_spent_total", "Coins spent on packs, market buys and refreshes.", "counter", f"{self.coins_spent:.2f}")
+        gauge("tpot_cards_acquired_total", "Missing cards acquired.", "counter", self.cards_acquired)
+        gauge("tpot_coins_per_card", "Coins spent per missing card acquired.", "gauge", f"{self.coins_per_card():.4f}")
+        gauge("tpot_packs_opened_total", "Packs opened.", "counter", self.packs["opened"])
+        gauge("tpot_pack_overshoot_total", "Packs opened after the card they were for had already turned up.", "counter",
+              self.packs["overshoot"])
+        gauge("tpot_pack_seconds_total", "Time spent opening packs.", "counter", f"{self.packs['seconds']:.3f}")
+        if self.completion_eta is not None and self.completion_eta != float('inf'):
+            gauge("tpot_completion_eta_seconds", "Projected time to a complete collection.", "gauge", f"{self.completion_eta:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None):
+        path = path or self.config.get("path")
+        if not path:
+            return
+        try:
+            # Write then rename, so a scraper never reads half a file
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.log.warning("metrics_write_failed", "⚠️ Couldn't write metrics to {path}: {error}", path=path, error=str(e))
+
+    def summary(self, top=3):
+        requests = sum(hist.count for hist in self.latency.values())
+        request_time = sum(hist.sum for hist in self.latency.values())
+        slowest = sorted(self.latency.items(), key=lambda item: -item[1].sum)[:top]
+        parts = [f"{requests} requests"]
+        for endpoint, hist in slowest:
+            share = hist.sum / request_time * 100 if request_time else 0
+            parts.append(f"{endpoint} {share:.0f}% (p95 {hist.quantile(0.95) * 1000:.0f}ms)")
+        parts.append(f"{sum(self.retries.values())} retries, {sum(self.errors.values())} errors")
+        plan = self.phases.get("plan")
+        if plan:
+            parts.append(f"plan p50 {plan.quantile(0.5) * 1000:.0f}ms")
+        parts.append(f"${self.coins_per_card():.2f}/card")
+        return " | ".join(parts)
+
+    def on_cycle_end(self):
+        every = self.config.get("summary_every", 10)
+        if every and self.cycles % every == 0:
+            self.log.info("metrics", "📈 Metrics: {summary}", summary=self.summary())
+            self.write()
+
+    async def serve(self, port=None):
+        port = port or self.config.get("port")
+        if not port or self._server is not None:
+            return
+
+        async def handle(reader, writer):
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+                body = self.render().encode()
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                             + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+                await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        self._server = await asyncio.start_server(handle, "127.0.0.1", port)
+        self.log.info("metrics_serving", "📈 Serving metrics on http://127.0.0.1:{port}/metrics", port=port)
+
+    async def close(self):
+        self.write()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
@@ -0,0 +1,115 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+CARD_COUNT = 100
+
+# Every listing, deal and pack of a card shares one Card instance
+_interned_cards = {}
+
+@dataclass(frozen=True, slots=True)
+class Card:
+    number: int
+    name: str = ""
+    holo: bool = False
+
+    @classmethod
+    def from_json(cls, data):
+        key = (data['number'], data.get('name', ''), bool(data.get('holo', False)))
+        card = _interned_cards.get(key)
+        if card is None:
+            card = _interned_cards[key] = cls(*key)
+        return card
+
+    def to_json(self):
+        return {"number": self.number, "name": self.name, "holo": self.holo}
+
+@dataclass(frozen=True, slots=True)
+class Listing:
+    id: int
+    card: Card
+    price: float
+    quantity: int = 1
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['id'], Card.from_json(data['card']), data['price'], data.get('quantity', 1))
+
+    def to_json(self):
+        return {"id": self.id, "card": self.card.to_json(), "price": self.price, "quantity": self.quantity}
+
+@dataclass(frozen=True, slots=True)
+class Deal:
+    id: int
+    holo_card: Card
+    # (Card, quantity) pairs the trader wants in exchange
+    regular_cards: tuple
+
+    @classmethod
+    def from_json(cls, data):
+        regular_cards = tuple((Card.from_json(item['card']), item['quantity']) for item in data['regular_cards'])
+        return cls(data['id'], Card.from_json(data['holo_card']), regular_cards)
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "holo_card": self.holo_card.to_json(),
+            "regular_cards": [{"card": card.to_json(), "quantity": quantity} for card, quantity in self.regular_cards],
+        }
+
+class CardCounts:
+    # Copies owned per card number in a flat array indexed 1..100, plus a bitmask
+    # with bit n set while card n is owned. Missing sets and ownership checks are
+    # array/bit operations instead of str-keyed dict lookups.
+
+    __slots__ = ("counts", "mask")
+    ALL_CARDS = ((1 << (CARD_COUNT + 1)) - 1) & ~1
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(CARD_COUNT + 1, dtype=np.int32) if counts is None else counts
+        self.mask = int.from_bytes(np.packbits(self.counts > 0, bitorder='little').tobytes(), 'little')
+
+    @classmethod
+    def from_json(cls, cards):
+        counts = np.zeros(CARD_COUNT + 1, dtype=np.int32)
+        for card_number, count in cards.items():
+            card_number = int(card_number)
+            if 0 < card_number <= CARD_COUNT:
+                counts[card_number] = count
+        return cls(counts)
+
+    def to_json(self):
+        return {str(card_number): int(self.counts[card_number]) for card_number in np.flatnonzero(self.counts)}
+
+    def __getitem__(self, card_number):
+        return self.counts.item(card_number)
+
+    def owns(self, card_number):
+        return bool(self.mask >> card_number & 1)
+
+    def add(self, card_number, quantity):
+        self.counts[card_number] += quantity
+        if self.counts[card_number] > 0:
+            self.mask |= 1 << card_number
+        else:
+            self.mask &= ~(1 << card_number)
+
+    def missing_mask(self):
+        return self.ALL_CARDS & ~self.mask
+
+    def missing(self):
+        return (np.flatnonzero(self.counts[1:] <= 0) + 1).tolist()
+
+    def matches(self, other):
+        # Same cards in the same amounts; a negative count is as good as none
+        return np.array_equal(np.maximum(self.counts, 0), np.maximum(other.counts, 0))
+
+    def key(self):
+        return self.counts.tobytes()
+
+    def copy(self):
+        return CardCounts(self.counts.copy())
+
+    def union(self, other):
+        # The most copies of each card either side has
+        return CardCounts(np.maximum(self.counts, other.counts))
@@ -1,25 +1,30 @@
-async def auto_complete_collection(api_client, card_manager, balance, cards):
+from market_book import MarketBook
+from request_policy import failed
+
+async def auto_complete_collection(api_client, card_manager, inventory):
     if api_client.config["modules"]["auto_complete_collection"]["enabled"]:
-        print("Attempting to complete collection...")
-        all_card_numbers = set(range(1, 101))
-        owned_cards = set(map(int, cards.keys()))
-        missing_cards = all_card_numbers - owned_cards
+        api_client.log.info("auto_complete", "Attempting to complete collection...")
+        missing_cards = card_manager.check_missing_cards(inventory.cards)
         
         if missing_cards:
-            print(f"Missing cards: {sorted(missing_cards)}")
+            api_client.log.info("missing", "Missing cards: {cards}", cards=sorted(missing_cards))
             listings = await api_client.get_market_listings()
+            if failed(listings):
+                api_client.log.warning("auto_complete_no_market", "❌ Couldn't get the market ({reason}), trying again next time",
+                                       reason=str(listings))
+                return inventory
+            market_book = MarketBook(listings)
             for card_number in missing_cards:
-                cheapest = min((l for l in listings if l['card'].get('number') == card_number), key=lambda x: x['price'], default=None)
+                cheapest = market_book.cheapest(card_number)
                 if cheapest:
-                    acquisition_method, expected_cost = card_manager.calculate_card_acquisition_efficiency(card_number, cheapest['price'])
-                    if acquisition_method == "market" and expected_cost <= balance:
-                        if await api_client.buy_card(cheapest['id'], 1):
-                            balance -= cheapest['price']
-                            cards[str(card_number)] = cards.get(str(card_number), 0) + 1
-                            print(f"Bought missing card {card_number} for ${cheapest['price']}")
-                            # Update balance and cards after buying
-                            balance, cards = await api_client.get_user_info()
+                    acquisition_method, expected_cost = card_manager.calculate_card_acquisition_efficiency(card_number, cheapest.price)
+                    if acquisition_method == "market" and expected_cost <= inventory.balance:
+                        if await api_client.buy_card(cheapest.id, 1):
+                            inventory.apply_buy(card_number, 1, cheapest.price)
+                            api_client.log.info("bought", "Bought missing card {card} for ${price}", card=card_number,
+                                                entry=cheapest.id, quantity=1, price=cheapest.price)
                     elif acquisition_method == "pack":
-                        print(f"It's more efficient to get card {card_number} through packs. Expected cost: ${expected_cost:.2f}")
+                        api_client.log.debug("pack_cheaper", "It's more efficient to get card {card} through packs. Expected cost: ${cost:.2f}",
+                                             card=card_number, cost=expected_cost)
                         # The auto_pack_opener module will handle opening packs
-    return balance, cards
\ No newline at end of file
+    return inventory
\ No newline at end of file
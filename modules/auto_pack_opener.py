@@ -1,17 +1,22 @@
-async def auto_pack_opener(api_client, balance, cards):
+from request_policy import failed
+
+async def auto_pack_opener(api_client, inventory):
     pack_price = api_client.config["modules"]["auto_pack_opener"]["pack_price"]
     min_balance = api_client.config["modules"]["auto_pack_opener"]["min_balance"]
     
-    if balance - pack_price >= min_balance:
-        print(f"Opening a pack for ${pack_price}...")
-        new_balance, new_cards = await api_client.open_pack()
-        if new_balance is not None and new_cards is not None:
-            balance = new_balance
-            cards = new_cards
-            print(f"New balance: ${balance:.2f}")
+    if inventory.balance - pack_price >= min_balance:
+        api_client.log.info("pack_open", "Opening a pack for ${price}...", price=pack_price)
+        pack = await api_client.open_pack()
+        if not failed(pack):
+            new_balance, new_cards = pack
+            inventory.apply_pack(new_balance, new_cards, pack_price)
+            api_client.log.info("balance", "New balance: ${balance:.2f}", balance=inventory.balance)
+            return True
         else:
-            print("Failed to open pack.")
+            inventory.mark_stale()
+            api_client.log.warning("pack_failed", "Failed to open pack.")
     else:
-        print(f"Not opening pack to maintain minimum balance. Current balance: ${balance:.2f}")
+        api_client.log.info("pack_skipped", "Not opening pack to maintain minimum balance. Current balance: ${balance:.2f}",
+                            balance=inventory.balance)
     
-    return balance, cards
\ No newline at end of file
+    return False
\ No newline at end of file
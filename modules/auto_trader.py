@@ -1,13 +1,27 @@
-import httpx
+import asyncio
+import time
+
+from deal_history import HOLO_CARDS
+from market_book import MarketBook
+from planner import SPECIAL_CARDS
+from request_policy import RequestFailed, failed
 from modules.auto_pack_opener import auto_pack_opener
 
-async def auto_trader(api_client, card_manager, cards, balance):
+async def auto_trader(api_client, card_manager, inventory, price_history=None):
     if not api_client.config["modules"]["auto_trader"]["enabled"]:
-        return False, balance, cards, None
+        return False, None
 
+    cards, balance = inventory.cards, inventory.balance
     missing_cards = card_manager.check_missing_cards(cards)
-    deals = await get_trader_deals(api_client)
-    market_listings = await api_client.get_market_listings()
+    results, _ = await api_client.fan_out({
+        "deals": (get_trader_deals(api_client), RequestFailed("timed out")),
+        "market": (api_client.get_market_listings(), RequestFailed("timed out")),
+    })
+    if failed(results["deals"]) or failed(results["market"]):
+        api_client.log.warning("trade_blind", "❌ Couldn't fetch the market or deals, not trading blind")
+        return False, None
+    deals = results["deals"]
+    market_book = MarketBook(results["market"])
 
     cheapest_option = None
     cheapest_cost = float('inf')
@@ -17,42 +31,45 @@ async def auto_trader(api_client, card_manager, cards, balance):
         if 96 <= card_number <= 100:
             continue
 
-        acquisition_cost, method = await calculate_cheapest_acquisition(api_client, card_manager, card_number, deals, market_listings, cards, balance)
-        
+        acquisition_cost, method = await calculate_cheapest_acquisition(api_client, card_manager, card_number, deals, market_book, cards, balance,
+                                                                        price_history)
+        if method == "wait":
+            continue
+
         if acquisition_cost < cheapest_cost:
             cheapest_cost = acquisition_cost
             cheapest_option = (card_number, method)
             market_cheaper_than_packs = (method == "market")
 
     if cheapest_option is None or cheapest_cost > balance:
-        print(f"💸 No affordable cards. Cheapest: ${cheapest_cost:.2f}, Balance: ${balance:.2f}")
-        return False, balance, cards, market_cheaper_than_packs
+        api_client.log.info("unaffordable", "💸 No affordable cards. Cheapest: ${cost:.2f}, Balance: ${balance:.2f}",
+                            cost=cheapest_cost, balance=balance)
+        return False, market_cheaper_than_packs
 
     card_number, method = cheapest_option
-    print(f"🎯 Going for card {card_number} via {method} (${cheapest_cost:.2f})")
+    api_client.log.info("target", "🎯 Going for card {card} via {method} (${cost:.2f})", card=card_number, method=method, cost=cheapest_cost)
     
     if method == "trade":
-        deal = next(d for d in deals if d['holo_card']['number'] == card_number)
-        balance, cards, acquired = await execute_trade_strategy(api_client, card_manager, deal, balance, cards)
+        deal = next(d for d in deals if d.holo_card.number == card_number)
+        acquired = await execute_trade_strategy(api_client, card_manager, inventory, deal, market_book, budget=cheapest_cost)
     elif method == "market":
-        listing = next(l for l in market_listings if l['card']['number'] == card_number)
-        balance, cards, acquired = await buy_from_market(api_client, card_number, listing['id'], balance, cards)
+        listing = market_book.cheapest(card_number)
+        acquired = await buy_from_market(api_client, inventory, card_number, listing.id, market_book=market_book)
     else:
-        balance, cards, acquired = await open_packs_strategy(api_client, card_manager, card_number, balance, cards)
+        acquired = await open_packs_strategy(api_client, card_manager, inventory, card_number)
 
     if acquired:
-        print(f"✅ Snagged card {card_number}")
-        return True, balance, cards, market_cheaper_than_packs
+        api_client.log.info("acquired", "✅ Snagged card {card}", card=card_number)
+        return True, market_cheaper_than_packs
 
-    print(f"❌ Couldn't get card {card_number}")
-    return False, balance, cards, market_cheaper_than_packs
+    api_client.log.warning("not_acquired", "❌ Couldn't get card {card}", card=card_number)
+    return False, market_cheaper_than_packs
 
-async def calculate_cheapest_acquisition(api_client, card_manager, card_number, deals, market_listings, cards, balance):
-    deal = next((d for d in deals if d['holo_card']['number'] == card_number), None)
-    market_listing = next((l for l in market_listings if l['card']['number'] == card_number), None)
+async def calculate_cheapest_acquisition(api_client, card_manager, card_number, deals, market_book, cards, balance, price_history=None):
+    deal = next((d for d in deals if d.holo_card.number == card_number), None)
 
-    trade_cost = calculate_trade_cost(deal, cards, market_listings) if deal else float('inf')
-    market_cost = market_listing['price'] if market_listing else float('inf')
+    trade_cost = calculate_trade_cost(deal, cards, market_book) if deal else float('inf')
+    market_cost = market_book.cheapest_price(card_number)
     pack_cost = card_manager.calculate_card_acquisition_efficiency(card_number, float('inf'))[1]
 
     costs = [
@@ -61,140 +78,274 @@ async def calculate_cheapest_acquisition(api_client, card_manager, card_number,
         (pack_cost, "pack")
     ]
 
+    if price_history is not None and price_history.is_spike(card_number, market_cost):
+        # A spiked listing should come back to its usual price; waiting for it
+        # wins if that still beats the other ways
+        costs.append((price_history.median(card_number), "wait"))
+
     min_cost, method = min(costs, key=lambda x: x[0])
     return min_cost, method
 
-def calculate_trade_cost(deal, cards, market_listings):
+def calculate_trade_cost(deal, cards, market_book):
     if not deal:
         return float('inf')
     
     total_cost = 0
-    for card_data in deal['regular_cards']:
-        card_number = str(card_data['card']['number'])
-        required_quantity = card_data['quantity']
-        owned_quantity = cards.get(card_number, 0)
-        if owned_quantity < required_quantity:
-            needed_quantity = required_quantity - owned_quantity
-            cheapest_listing = min((l for l in market_listings if l['card']['number'] == int(card_number)), key=lambda x: x['price'], default=None)
-            if cheapest_listing:
-                total_cost += cheapest_listing['price'] * needed_quantity
-            else:
-                return float('inf')
+    for card, required_quantity in deal.regular_cards:
+        # Keep one copy back, trading away the last one would un-complete the collection
+        spare_quantity = max(cards[card.number] - 1, 0)
+        if spare_quantity < required_quantity:
+            needed_quantity = required_quantity - spare_quantity
+            total_cost += market_book.cost_for(card.number, needed_quantity)
     return total_cost
 
-async def execute_trade_strategy(api_client, card_manager, deal, balance, cards):
-    needed_cards = get_needed_cards(deal, cards)
+async def execute_trade_strategy(api_client, card_manager, inventory, deal, market_book=None, budget=None):
+    needed_cards = get_needed_cards(deal, inventory.cards)
+    if needed_cards and market_book is None:
+        listings = await api_client.get_market_listings()
+        if failed(listings):
+            api_client.log.warning("trade_no_market", "❌ Couldn't get the market for trade ({reason}). Bailing...",
+                                   deal=deal.id, reason=str(listings))
+            return False
+        market_book = MarketBook(listings)
+
+    # Price the whole fill across the book before spending anything
+    fills = {}
+    fill_cost = 0
     for card_number, quantity in needed_cards.items():
-        balance, cards, success = await buy_from_market(api_client, int(card_number), None, balance, cards, quantity)
-        if not success:
-            print(f"❌ Couldn't buy cards for trade. Bailing...")
-            return balance, cards, False
-
-    if await execute_trade(api_client, deal['id']):
-        holo_card_number = str(deal['holo_card']['number'])
-        cards[holo_card_number] = cards.get(holo_card_number, 0) + 1
-        for card_data in deal['regular_cards']:
-            card_number = str(card_data['card']['number'])
-            cards[card_number] -= card_data['quantity']
-        print(f"🔄 Traded for card {holo_card_number}")
-        return balance, cards, True
-    return balance, cards, False
-
-async def buy_from_market(api_client, card_number, entry_id, balance, cards, quantity=1):
+        fills[card_number] = market_book.fill(card_number, quantity)
+        if sum(take for _, take in fills[card_number]) < quantity:
+            api_client.log.warning("trade_short", "❌ Not enough of card {card} on the market for trade. Bailing...",
+                                   card=card_number, deal=deal.id)
+            return False
+        fill_cost += sum(listing.price * take for listing, take in fills[card_number])
+    if budget is not None and round(fill_cost, 2) > round(budget, 2):
+        api_client.log.warning("trade_over_budget", "❌ Trade inputs cost ${cost:.2f}, over the planned ${budget:.2f}. Bailing...",
+                               deal=deal.id, cost=fill_cost, budget=budget)
+        return False
+    if fill_cost > inventory.balance:
+        api_client.log.warning("trade_over_balance", "❌ Trade inputs cost ${cost:.2f}, more than our ${balance:.2f}. Bailing...",
+                               deal=deal.id, cost=fill_cost, balance=inventory.balance)
+        return False
+
+    if fills:
+        bought = await buy_fills(api_client, inventory, fills, market_book)
+        short = {card_number: quantity - bought[card_number]
+                 for card_number, quantity in needed_cards.items() if bought[card_number] < quantity}
+        if short:
+            for card_number, missing in short.items():
+                api_client.log.warning("partial_fill", "🧩 Partial fill for card {card}: got {got}/{wanted}",
+                                       card=card_number, got=needed_cards[card_number] - missing, wanted=needed_cards[card_number])
+            api_client.log.warning("trade_unfilled", "❌ Couldn't buy cards for trade. Bailing...", deal=deal.id)
+            return False
+
+    if await execute_trade(api_client, deal.id):
+        inventory.apply_trade(deal)
+        api_client.log.info("traded", "🔄 Traded for card {card}", card=deal.holo_card.number, deal=deal.id)
+        return True
+    # A rejected trade usually means our view of the inventory is off
+    inventory.mark_stale()
+    return False
+
+async def buy_fills(api_client, inventory, fills, market_book=None):
+    # fills: card_number -> [(listing, units)]. The buys go out together, at most
+    # `max_concurrent_buys` in flight; returns card_number -> units actually bought
+    slots = asyncio.Semaphore(api_client.config["modules"]["auto_trader"].get("max_concurrent_buys", 4))
+
+    async def buy(card_number, listing, quantity):
+        async with slots:
+            if await buy_from_market(api_client, inventory, card_number, listing.id, quantity, market_book):
+                return card_number, quantity
+            return card_number, 0
+
+    results = await asyncio.gather(*(
+        buy(card_number, listing, quantity) for card_number, fill in fills.items() for listing, quantity in fill
+    ))
+    bought = dict.fromkeys(fills, 0)
+    for card_number, quantity in results:
+        bought[card_number] += quantity
+    return bought
+
+async def buy_from_market(api_client, inventory, card_number, entry_id, quantity=1, market_book=None):
     if entry_id is None:
-        listings = await api_client.get_market_listings()
-        cheapest = min((l for l in listings if l['card']['number'] == card_number), key=lambda x: x['price'], default=None)
+        if market_book is None:
+            listings = await api_client.get_market_listings()
+            if failed(listings):
+                api_client.log.warning("buy_no_market", "❌ Couldn't get the market to buy card {card} ({reason})",
+                                       card=card_number, reason=str(listings))
+                return False
+            market_book = MarketBook(listings)
+        cheapest = market_book.cheapest(card_number)
         if not cheapest:
-            print(f"❌ Card {card_number} not in market")
-            return balance, cards, False
-        entry_id = cheapest['id']
+            api_client.log.warning("not_listed", "❌ Card {card} not in market", card=card_number)
+            return False
+        entry_id = cheapest.id
     
-    card_price = await api_client.get_card_price(entry_id)
+    listing = market_book.get(entry_id) if market_book is not None else None
+    card_price = listing.price if listing else await api_client.get_card_price(entry_id)
     if card_price is None:
-        return balance, cards, False
+        return False
 
     success = await api_client.buy_card(entry_id, quantity)
     if success:
         total_cost = card_price * quantity
-        balance -= total_cost
-        cards[str(card_number)] = cards.get(str(card_number), 0) + quantity
-        print(f"💰 Bought {quantity} of card {card_number} for ${card_price} each. Total: ${total_cost:.2f}")
-        new_balance, new_cards = await api_client.get_user_info()
-        if new_balance is not None and new_cards is not None:
-            balance, cards = new_balance, new_cards
-        return balance, cards, True
-    return balance, cards, False
-
-async def open_packs_strategy(api_client, card_manager, target_card_number, balance, cards):
-    initial_balance = balance
+        inventory.apply_buy(card_number, quantity, total_cost)
+        api_client.log.info("bought", "💰 Bought {quantity} of card {card} for ${price} each. Total: ${total:.2f}",
+                            card=card_number, entry=entry_id, quantity=quantity, price=card_price, total=total_cost)
+        return True
+    inventory.mark_stale()
+    return False
+
+async def open_packs_strategy(api_client, card_manager, inventory, target_card_number, target_cards=None):
+    pack_config = api_client.config["modules"]["auto_pack_opener"]
+    if pack_config.get("max_in_flight", 1) > 1:
+        return await open_packs_pipelined(api_client, card_manager, inventory, target_card_number, target_cards)
+    wanted = pack_targets(card_manager, inventory, target_card_number, target_cards)
+    missing_before = len(card_manager.check_missing_cards(inventory.cards))
     packs_opened = 0
-    while balance >= api_client.config["modules"]["auto_pack_opener"]["pack_price"]:
-        new_balance, new_cards = await auto_pack_opener(api_client, balance, cards)
-        if new_balance is None or new_cards is None:
-            print("❌ Pack opening failed")
-            break
-        balance = new_balance
-        cards = new_cards
-        packs_opened += 1
-        if target_card_number is not None:
-            if str(target_card_number) in cards and cards[str(target_card_number)] > 0:
-                print(f"✅ Got card {target_card_number} after {packs_opened} packs")
-                return True, balance, cards
-        else:
-            print(f"Opened {packs_opened} pack(s)")
-            return True, balance, cards
-    if target_card_number is not None:
-        print(f"❌ Didn't get card {target_card_number} after {packs_opened} packs")
+    started = time.perf_counter()
+    try:
+        while (not packs_done(inventory, wanted) and packs_opened < pack_config.get("max_packs", 8)
+               and inventory.balance >= pack_config["pack_price"]):
+            if not await auto_pack_opener(api_client, inventory):
+                api_client.log.warning("pack_failed", "❌ Pack opening failed")
+                break
+            packs_opened += 1
+        api_client.log.info("packs_opened", "Opened {packs} pack(s)", packs=packs_opened)
+        return report_packs(api_client, card_manager, inventory, wanted, packs_opened, missing_before)
+    finally:
+        # One at a time, nothing is ever opened past the target
+        api_client.metrics.observe_packs(packs_opened, 0, time.perf_counter() - started)
+
+def pack_targets(card_manager, inventory, target_card_number, target_cards=None):
+    # The missing cards we're opening packs for: the plan step's, the one
+    # target, or without either, anything a pack could bring
+    if target_cards or target_card_number is not None:
+        cards = target_cards or [target_card_number]
     else:
-        print(f"Opened {packs_opened} pack(s)")
-    return packs_opened > 0, balance, cards
+        cards = [card_number for card_number in card_manager.check_missing_cards(inventory.cards) if card_number not in SPECIAL_CARDS]
+    return {card_number for card_number in cards if not inventory.cards.owns(card_number)}
+
+def packs_done(inventory, wanted):
+    # Any one of them coming in changes the plan, so it's time to re-plan
+    return not wanted or any(inventory.cards.owns(card_number) for card_number in wanted)
+
+def report_packs(api_client, card_manager, inventory, wanted, opened, missing_before):
+    # Worked if the packs brought any card we were missing
+    got = sorted(card_number for card_number in wanted if inventory.cards.owns(card_number))
+    if got:
+        api_client.log.info("pack_hit", "✅ Got cards {cards} after {packs} packs", cards=got, packs=opened)
+    elif wanted:
+        api_client.log.warning("pack_miss", "❌ Didn't get any of cards {cards} after {packs} packs", cards=sorted(wanted), packs=opened)
+    return len(card_manager.check_missing_cards(inventory.cards)) < missing_before
+
+async def open_packs_pipelined(api_client, card_manager, inventory, target_card_number, target_cards=None):
+    # Keeps up to `max_in_flight` packs opening at once, never more than the
+    # balance covers or `max_packs`, and stops sending new ones as soon as a
+    # card we're after is in. Packs already in flight by then still land;
+    # those are the overshoot.
+    pack_config = api_client.config["modules"]["auto_pack_opener"]
+    pack_price, min_balance = pack_config["pack_price"], pack_config["min_balance"]
+    affordable = min(int((inventory.balance - min_balance) // pack_price), pack_config.get("max_packs", 8))
+    wanted = pack_targets(card_manager, inventory, target_card_number, target_cards)
+    missing_before = len(card_manager.check_missing_cards(inventory.cards))
+    started = time.perf_counter()
+    in_flight = set()
+    sent = opened = 0
+    opened_when_done = 0 if packs_done(inventory, wanted) else None
+    failed_pack = False
+
+    while True:
+        while (opened_when_done is None and not failed_pack and sent < affordable
+               and len(in_flight) < pack_config["max_in_flight"]):
+            in_flight.add(asyncio.create_task(api_client.open_pack()))
+            sent += 1
+        if not in_flight:
+            break
+        finished, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in finished:
+            pack = task.result()
+            if failed(pack):
+                # Could be anything from a bad balance to a network error; the rest can land, but no more go out
+                failed_pack = True
+                inventory.mark_stale()
+                continue
+            opened += 1
+            inventory.merge_pack(*pack, pack_price)
+            if opened_when_done is None and packs_done(inventory, wanted):
+                opened_when_done = opened
+
+    seconds = time.perf_counter() - started
+    if opened:
+        # No single pack answer has the latest balance, a claim may have landed in between
+        inventory.mark_stale()
+        await inventory.reconcile()
+    overshoot = opened - opened_when_done if opened_when_done is not None else 0
+    api_client.metrics.observe_packs(opened, overshoot, seconds)
+    api_client.log.info("packs_opened", "📦 Opened {packs} packs in {seconds:.2f}s ({rate:.1f}/s), {overshoot} after we were done. "
+                        "Balance: ${balance:.2f}", packs=opened, sent=sent, seconds=seconds, rate=opened / seconds if seconds else 0.0,
+                        overshoot=overshoot, balance=inventory.balance, card=target_card_number)
+    if failed_pack:
+        api_client.log.warning("pack_failed", "❌ Pack opening failed")
+    return report_packs(api_client, card_manager, inventory, wanted, opened, missing_before)
 
 async def get_trader_deals(api_client):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{api_client.BASE_URL}/trader/deals", headers=api_client.headers_bearer)
-        if resp.status_code == 200:
-            return resp.json()['deals']
-        else:
-            print(f"❌ Couldn't get trader deals: {resp.json()}")
-            return []
-    except Exception as e:
-        print(f"❌ Error getting trader deals: {e}")
-        return []
+    return await api_client.get_trader_deals()
 
 async def execute_trade(api_client, deal_id):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{api_client.BASE_URL}/trader/trade", headers=api_client.headers_bearer, json={"deal_id": deal_id})
-        if resp.status_code == 200:
-            print(f"✅ Trade executed for deal ID: {deal_id}")
-            return True
-        else:
-            print(f"❌ Trade failed: {resp.json()}")
-            return False
-    except Exception as e:
-        print(f"❌ Error executing trade: {e}")
-        return False
+    return await api_client.execute_trade(deal_id)
 
 def get_needed_cards(deal, cards):
     needed_cards = {}
-    for card_data in deal['regular_cards']:
-        card_number = str(card_data['card']['number'])
-        required_quantity = card_data['quantity']
-        if cards.get(card_number, 0) < required_quantity:
-            needed_quantity = required_quantity - cards.get(card_number, 0)
-            needed_cards[card_number] = needed_quantity
+    for card, required_quantity in deal.regular_cards:
+        spare_quantity = max(cards[card.number] - 1, 0)
+        if spare_quantity < required_quantity:
+            needed_cards[card.number] = required_quantity - spare_quantity
     return needed_cards
 
 async def refresh_trader_deals(api_client):
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(f"{api_client.BASE_URL}/trader/refresh", headers=api_client.headers_bearer)
-        if resp.status_code == 200:
-            return resp.json()['deals']
-        else:
-            print(f"❌ Couldn't refresh trader deals: {resp.json()}")
-            return None
-    except Exception as e:
-        print(f"❌ Error refreshing trader deals: {e}")
-        return None
\ No newline at end of file
+    return await api_client.refresh_trader_deals()
+
+async def maybe_refresh_deals(api_client, card_manager, inventory, deals, market_book, deal_history):
+    # Pays for a new deal set when a random one is expected to save more on the
+    # missing holos than the current set does, by more than the refresh costs.
+    # Returns the deals to plan with.
+    price = api_client.config["modules"]["auto_trader"].get("max_refresh_price")
+    if not price or inventory.balance is None or inventory.balance < price:
+        return deals
+    missing_holos = [card_number for card_number in card_manager.check_missing_cards(inventory.cards) if card_number in HOLO_CARDS]
+    if not missing_holos:
+        return deals
+
+    # The pack odds need the simulation, which is re-run after every recalibration;
+    # run it off the event loop, like the planner, so a due claim isn't held up
+    await asyncio.to_thread(card_manager.pack_model.first_hits)
+    # What each missing holo costs us with no deal at all
+    baseline = {
+        card_number: min(market_book.cheapest_price(card_number),
+                         card_manager.calculate_card_acquisition_efficiency(card_number, float('inf'))[1])
+        for card_number in missing_holos
+    }
+
+    def trade_cost(deal):
+        return calculate_trade_cost(deal, inventory.cards, market_book)
+
+    def offers(deal_set):
+        return [(deal.holo_card.number, trade_cost(deal)) for deal in deal_set]
+
+    current = deal_history.set_value(baseline, offers(deals))
+    expected = deal_history.expected_value(baseline, trade_cost, deal_history.set_size or len(deals) or 4)
+    if expected - current <= price:
+        return deals
+
+    api_client.log.info("deal_refresh", "🔀 Refreshing deals for ${price}: a new set should save ${expected:.2f} on missing holos, "
+                        "this one saves ${current:.2f}", price=price, expected=expected, current=current)
+    fresh = await refresh_trader_deals(api_client)
+    if not fresh:
+        return deals
+    inventory.apply_spend(price)
+    saved = deal_history.set_value(baseline, offers(fresh)) - current
+    deal_history.record_refresh(fresh, price, saved)
+    api_client.log.info("deal_refreshed", "🔀 New deals save ${saved:+.2f} over the old set ({summary})",
+                        saved=saved, summary=deal_history.summary())
+    return fresh
\ No newline at end of file
@@ -0,0 +1,188 @@
+import base64
+import zlib
+
+import numpy as np
+
+class SimulationResult:
+    def __init__(self, samples, z):
+        self.mean = float(samples.mean())
+        half_width = z * float(samples.std()) / np.sqrt(len(samples)) if len(samples) > 1 else 0.0
+        self.low = self.mean - half_width
+        self.high = self.mean + half_width
+
+    def scaled(self, factor):
+        scaled = SimulationResult.__new__(SimulationResult)
+        scaled.mean, scaled.low, scaled.high = self.mean * factor, self.low * factor, self.high * factor
+        return scaled
+
+    def __str__(self):
+        return f"{self.mean:.2f} [{self.low:.2f}, {self.high:.2f}]"
+
+class PackSimulator:
+    # A pack is `regular_slots` regular draws plus, with probability `holo_rate`,
+    # one holo draw, every card of a rarity equally likely. The packs we open
+    # re-estimate the holo rate and slot count. Per-card odds stay uniform: the
+    # cards we're missing are the ones we've never drawn, and learning from
+    # that would make them look all but impossible to get.
+
+    def __init__(self, config):
+        model_config = config.get("pack_model", {})
+        self.trials = model_config.get("trials", 2000)
+        self.regular_slots = model_config.get("regular_slots", 5)
+        self.holo_rate = model_config.get("holo_rate", 0.2)
+        self.max_packs = model_config.get("max_packs", 5000)
+        self.recalibrate_every = model_config.get("recalibrate_every", 25)
+        self.z = model_config.get("confidence_z", 1.96)
+        # A recorded session pins the seed so its replay draws the same numbers
+        self.rng = np.random.default_rng(model_config.get("seed", config.get("session", {}).get("seed")))
+
+        self.observed_packs = 0
+        self.observed_holo_packs = 0
+        self.observed_regulars = 0
+        self.set_catalog([])
+
+    def set_catalog(self, catalog):
+        # Specials (96-100) never come out of packs
+        regular = sorted(c.number for c in catalog if not c.holo and c.number < 96)
+        holo = sorted(c.number for c in catalog if c.holo and c.number < 96)
+        self.regular_cards = np.array(regular or range(1, 81))
+        self.holo_cards = np.array(holo or range(81, 96))
+        self.card_numbers = np.concatenate([self.regular_cards, self.holo_cards])
+        self.column = np.full(101, -1)
+        self.column[self.card_numbers] = np.arange(len(self.card_numbers))
+        self.regular_weights = np.full(len(self.regular_cards), 1 / len(self.regular_cards))
+        self.holo_weights = np.full(len(self.holo_cards), 1 / len(self.holo_cards))
+        self._invalidate()
+
+    def _invalidate(self):
+        self._first_hits = None
+        self._pack_table = None
+        self._cache = {}
+
+    def observe_pack(self, new_cards):
+        self.observed_packs += 1
+        if any(card.holo for card in new_cards):
+            self.observed_holo_packs += 1
+        self.observed_regulars += sum(1 for card in new_cards if card.number < 96 and not card.holo)
+        if self.observed_packs % self.recalibrate_every == 0:
+            self.calibrate()
+
+    def calibrate(self):
+        if not self.observed_packs:
+            return
+        self.holo_rate = (self.observed_holo_packs + 1) / (self.observed_packs + 2)
+        self.regular_slots = max(1, int(round(self.observed_regulars / self.observed_packs)))
+        self._invalidate()
+
+    def _draw_packs(self, trials, packs):
+        # (trials, packs, slots) of card columns, -1 for an empty holo slot
+        regular = self.rng.choice(len(self.regular_cards), size=(trials, packs, self.regular_slots), p=self.regular_weights)
+        holo = self.rng.choice(len(self.holo_cards), size=(trials, packs, 1), p=self.holo_weights) + len(self.regular_cards)
+        holo[self.rng.random((trials, packs, 1)) >= self.holo_rate] = -1
+        return np.concatenate([regular, holo], axis=2)
+
+    def first_hits(self):
+        # Pack index (1-based) at which every card first shows up, per trial.
+        # Computed once per calibration and shared by every query below.
+        if self._first_hits is not None:
+            return self._first_hits
+        n_cards = len(self.card_numbers)
+        first = np.full((self.trials, n_cards), self.max_packs, dtype=np.int32)
+        pending = np.arange(self.trials)
+        offset = 0
+        chunk = max(16, int(2e7 // (self.trials * (n_cards + 1))))
+        while len(pending) and offset < self.max_packs:
+            packs = min(chunk, self.max_packs - offset)
+            draws = self._draw_packs(len(pending), packs)
+            seen = np.zeros((len(pending), packs, n_cards + 1), dtype=bool)
+            seen[np.arange(len(pending))[:, None, None], np.arange(packs)[None, :, None], draws + 1] = True
+            seen = seen[:, :, 1:]
+            hit_any = seen.any(axis=1)
+            hit_at = seen.argmax(axis=1) + offset + 1
+            rows = first[pending]
+            update = hit_any & (rows == self.max_packs)
+            rows[update] = hit_at[update]
+            first[pending] = rows
+            pending = pending[(first[pending] == self.max_packs).any(axis=1)]
+            offset += packs
+        self._first_hits = first
+        return first
+
+    def snapshot(self):
+        # Everything needed to skip re-simulating on the next start. first_hits is
+        # the expensive part; pack numbers fit in uint16 and compress well.
+        snapshot = {
+            "catalog": [self.regular_cards.tolist(), self.holo_cards.tolist()],
+            "trials": self.trials,
+            "max_packs": self.max_packs,
+            "regular_slots": self.regular_slots,
+            "holo_rate": self.holo_rate,
+            "observed_packs": self.observed_packs,
+            "observed_holo_packs": self.observed_holo_packs,
+            "observed_regulars": self.observed_regulars,
+        }
+        if self._first_hits is not None and self.max_packs < 2 ** 16:
+            snapshot["first_hits"] = base64.b64encode(zlib.compress(self._first_hits.astype(np.uint16).tobytes())).decode()
+        return snapshot
+
+    def restore(self, snapshot):
+        if not snapshot or snapshot.get("catalog") != [self.regular_cards.tolist(), self.holo_cards.tolist()]:
+            return False
+        self.regular_slots = snapshot["regular_slots"]
+        self.holo_rate = snapshot["holo_rate"]
+        self.observed_packs = snapshot["observed_packs"]
+        self.observed_holo_packs = snapshot["observed_holo_packs"]
+        self.observed_regulars = snapshot["observed_regulars"]
+        self._invalidate()
+        # The simulation is only reusable if it was run with the same trial budget,
+        # and not by a version that skewed the per-card weights
+        reusable = "regular_weights" not in snapshot and (snapshot["trials"], snapshot["max_packs"]) == (self.trials, self.max_packs)
+        if snapshot.get("first_hits") and reusable:
+            first = np.frombuffer(zlib.decompress(base64.b64decode(snapshot["first_hits"])), dtype=np.uint16)
+            self._first_hits = first.astype(np.int32).reshape(self.trials, len(self.card_numbers))
+        return True
+
+    def expected_packs(self, card_numbers):
+        key = ('packs', frozenset(card_numbers))
+        if key not in self._cache:
+            columns = self.column[[c for c in card_numbers if 0 < c < 101 and self.column[c] >= 0]]
+            if len(columns) == 0:
+                samples = np.zeros(self.trials)
+            else:
+                samples = self.first_hits()[:, columns].max(axis=1)
+            self._cache[key] = SimulationResult(samples, self.z)
+        return self._cache[key]
+
+    def expected_completion_cost(self, missing_cards, pack_price):
+        return self.expected_packs(missing_cards).scaled(pack_price)
+
+    def pack_table(self):
+        # Expected packs to get r specific regulars and h specific holos, for all
+        # r and h at once: shuffle the card order per trial and take running maxima
+        if self._pack_table is None:
+            first = self.first_hits()
+            n_regular = len(self.regular_cards)
+            regular_order = np.argsort(self.rng.random((self.trials, n_regular)), axis=1)
+            holo_order = np.argsort(self.rng.random((self.trials, len(self.holo_cards))), axis=1)
+            regular = np.take_along_axis(first[:, :n_regular], regular_order, axis=1)
+            holo = np.take_along_axis(first[:, n_regular:], holo_order, axis=1)
+            regular = np.concatenate([np.zeros((self.trials, 1), dtype=np.int32), np.maximum.accumulate(regular, axis=1)], axis=1)
+            holo = np.concatenate([np.zeros((self.trials, 1), dtype=np.int32), np.maximum.accumulate(holo, axis=1)], axis=1)
+            self._pack_table = np.maximum(regular[:, :, None], holo[:, None, :]).mean(axis=0)
+        return self._pack_table
+
+    def marginal_pack_value(self, missing_cards, card_values):
+        # Value of the distinct missing cards one pack yields, `card_values`
+        # being what each missing card would cost us some other way
+        key = ('value', frozenset(missing_cards), tuple(sorted(card_values.items())))
+        if key not in self._cache:
+            values = np.zeros(len(self.card_numbers) + 1)
+            for card_number in missing_cards:
+                if 0 < card_number < 101 and self.column[card_number] >= 0:
+                    values[self.column[card_number] + 1] = card_values.get(card_number, 0)
+            draws = np.sort(self._draw_packs(self.trials, 1)[:, 0, :], axis=1) + 1
+            distinct = np.ones_like(draws, dtype=bool)
+            distinct[:, 1:] = draws[:, 1:] != draws[:, :-1]
+            samples = (values[draws] * distinct).sum(axis=1)
+            self._cache[key] = SimulationResult(samples, self.z)
+        return self._cache[key]
@@ -0,0 +1,41 @@
+import time
+from contextlib import contextmanager
+
+class PhaseTimer:
+    def __init__(self, profiler=None):
+        self.profiler = profiler
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.details = {}
+
+    @contextmanager
+    def phase(self, name):
+        if self.profiler is not None:
+            self.profiler.enter(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.record(name, seconds)
+            if self.profiler is not None:
+                self.profiler.exit(name, seconds)
+
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def record_details(self, name, timings):
+        self.details.setdefault(name, {}).update(timings)
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def summary(self):
+        parts = []
+        for name, seconds in self.phases.items():
+            part = f"{name} {seconds * 1000:.0f}ms"
+            details = self.details.get(name)
+            if details:
+                part += " (" + ", ".join(f"{key} {value * 1000:.0f}ms" for key, value in details.items()) + ")"
+            parts.append(part)
+        return " | ".join(parts) + f" | total {self.total() * 1000:.0f}ms"
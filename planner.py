@@ -0,0 +1,192 @@
+import time
+
+SPECIAL_CARDS = range(96, 101)
+
+class Plan:
+    def __init__(self, steps, total_cost, optimal, nodes, elapsed, reused=False):
+        self.steps = steps
+        self.total_cost = total_cost
+        self.optimal = optimal
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.reused = reused
+
+    def summary(self):
+        if self.reused:
+            return f"{len(self.steps)} steps, total ${self.total_cost:.2f} (reused, no relevant price changes)"
+        search = "optimal" if self.optimal else "best found"
+        return (f"{len(self.steps)} steps, total ${self.total_cost:.2f} "
+                f"({search}, {self.nodes} nodes in {self.elapsed * 1000:.0f}ms)")
+
+class CollectionPlanner:
+    # Prices the whole missing set at once: each card is bought, traded for or
+    # left to packs. Trades share regular inputs (one copy is always kept) and
+    # everything bought walks the same market depth, while one pack progresses
+    # several cards. Deal subsets are searched branch-and-bound under a node and
+    # time budget; for each subset the pack/market split is solved exactly.
+
+    def __init__(self, config, pack_cost):
+        planner_config = config.get("planner", {})
+        self.time_budget = planner_config.get("time_budget", 0.25)
+        self.node_limit = planner_config.get("node_limit", 5000)
+        # (regular_count, holo_count) -> expected cost of getting that many specific cards from packs
+        self.pack_cost = pack_cost
+        # (inputs key, cards whose prices matter, plan) from the last full search
+        self._last = None
+        self.stats = {"searched": 0, "reused": 0}
+
+    def plan(self, missing_cards, market_book, deals, cards, changed_cards=None):
+        # changed_cards: cards whose listings changed since the previous call, or
+        # None if unknown. With the same missing set, deals and owned cards, a plan
+        # only goes stale when one of the cards it prices was relisted.
+        start = time.perf_counter()
+        key = (frozenset(missing_cards), tuple(sorted(deal.id for deal in deals)), cards.key())
+        if changed_cards is not None and self._last is not None and self._last[0] == key:
+            if not changed_cards & self._last[1]:
+                self.stats["reused"] += 1
+                last = self._last[2]
+                return Plan(last.steps, last.total_cost, last.optimal, 0, time.perf_counter() - start, reused=True)
+
+        targets = [card_number for card_number in missing_cards if card_number not in SPECIAL_CARDS]
+        self._book = market_book
+        self._cards = cards
+        self._missing = set(targets)
+        self._regular = [card_number for card_number in targets if card_number <= 80]
+        self._holo = [card_number for card_number in targets if card_number > 80]
+        self._pack_costs = [[self.pack_cost(r, h) for h in range(len(self._holo) + 1)]
+                            for r in range(len(self._regular) + 1)]
+
+        # Only deals for a missing holo matter; try the cheapest ones first so
+        # the incumbent gets good early and prunes more
+        candidates = [deal for deal in deals if deal.holo_card.number in self._missing]
+        candidates.sort(key=lambda deal: self._inputs_cost(self._consumption([deal])))
+
+        self._deadline = time.perf_counter() + self.time_budget
+        self._nodes = 0
+        self._complete = True
+        self._best_cost, self._best = self._evaluate({}, set(), set())
+        self._best_deals = []
+        self._search(candidates, 0, [], {}, set())
+
+        steps = self._build_steps(self._best_deals, self._best)
+        plan = Plan(steps, self._best_cost, self._complete, self._nodes, time.perf_counter() - start)
+        priced = set(targets) | {card_number for deal in candidates for card_number in self._consumption([deal])}
+        self._last = (key, priced, plan)
+        self.stats["searched"] += 1
+        return plan
+
+    def _search(self, candidates, index, chosen, consumed, covered):
+        self._nodes += 1
+        if self._nodes > self.node_limit or time.perf_counter() > self._deadline:
+            self._complete = False
+            return
+        remaining_holos = {deal.holo_card.number for deal in candidates[index:]} - covered
+        bound, assignment = self._evaluate(consumed, covered, remaining_holos)
+        if bound >= self._best_cost:
+            return
+        if index == len(candidates):
+            # No deals left to decide, so the bound is this selection's exact cost
+            self._best_cost, self._best, self._best_deals = bound, assignment, list(chosen)
+            return
+
+        deal = candidates[index]
+        holo_card_number = deal.holo_card.number
+        if holo_card_number not in covered:
+            with_deal = dict(consumed)
+            for card_number, quantity in self._consumption([deal]).items():
+                with_deal[card_number] = with_deal.get(card_number, 0) + quantity
+            self._search(candidates, index + 1, chosen + [deal], with_deal, covered | {holo_card_number})
+        self._search(candidates, index + 1, chosen, consumed, covered)
+
+    def _consumption(self, deals):
+        consumed = {}
+        for deal in deals:
+            for card, quantity in deal.regular_cards:
+                consumed[card.number] = consumed.get(card.number, 0) + quantity
+        return consumed
+
+    def _trade_units(self, consumed):
+        # Units to buy so the trades can be paid while still keeping one copy.
+        # A missing card's own copy is accounted for separately (market or pack).
+        units = {}
+        for card_number, quantity in consumed.items():
+            needed = max(0, 1 + quantity - self._cards[card_number]) - (1 if card_number in self._missing else 0)
+            if needed > 0:
+                units[card_number] = needed
+        return units
+
+    def _inputs_cost(self, consumed):
+        return sum(self._book.cost_for(card_number, units) for card_number, units in self._trade_units(consumed).items())
+
+    def _evaluate(self, consumed, covered, free_holos):
+        # free_holos are treated as costless, which makes this a lower bound
+        # for every extension of the current deal selection
+        trade_units = self._trade_units(consumed)
+        base = sum(self._book.cost_for(card_number, units) for card_number, units in trade_units.items())
+        if base == float('inf'):
+            return base, None
+
+        def marginal_costs(card_numbers):
+            costs = []
+            for card_number in card_numbers:
+                if card_number in covered or card_number in free_holos:
+                    continue
+                units = trade_units.get(card_number, 0)
+                costs.append((self._book.cost_for(card_number, units + 1) - self._book.cost_for(card_number, units), card_number))
+            costs.sort(key=lambda item: item[0], reverse=True)
+            return costs
+
+        regular_costs = marginal_costs(self._regular)
+        holo_costs = marginal_costs(self._holo)
+        regular_suffix = _suffix_sums([cost for cost, _ in regular_costs])
+        holo_suffix = _suffix_sums([cost for cost, _ in holo_costs])
+
+        # The most expensive cards to buy are the ones worth leaving to packs,
+        # so only the number of cards per rarity sent to packs has to be chosen
+        best_cost, best_split = float('inf'), (0, 0)
+        for regular_count in range(len(regular_costs) + 1):
+            if regular_suffix[regular_count] == float('inf'):
+                continue
+            pack_row = self._pack_costs[regular_count]
+            for holo_count in range(len(holo_costs) + 1):
+                cost = pack_row[holo_count] + regular_suffix[regular_count] + holo_suffix[holo_count]
+                if cost < best_cost:
+                    best_cost, best_split = cost, (regular_count, holo_count)
+
+        regular_count, holo_count = best_split
+        assignment = {
+            'pack': [card for _, card in regular_costs[:regular_count]] + [card for _, card in holo_costs[:holo_count]],
+            'pack_cost': self._pack_costs[regular_count][holo_count],
+            'market': regular_costs[regular_count:] + holo_costs[holo_count:],
+        }
+        return base + best_cost, assignment
+
+    def _build_steps(self, deals, assignment):
+        steps = []
+        if assignment is None:
+            return steps
+        for deal in deals:
+            steps.append({
+                'type': 'trade',
+                'card': deal.holo_card.number,
+                'cost': self._inputs_cost(self._consumption([deal])),
+                'deal': deal,
+            })
+        for cost, card_number in assignment['market']:
+            listing = self._book.cheapest(card_number)
+            steps.append({'type': 'market', 'card': card_number, 'cost': cost, 'entry_id': listing.id})
+        if assignment['pack']:
+            steps.append({
+                'type': 'pack',
+                'card': assignment['pack'][0],
+                'cards': assignment['pack'],
+                'cost': assignment['pack_cost'],
+            })
+        return steps
+
+def _suffix_sums(values):
+    # suffix[i] = sum(values[i:]), the cost of buying everything not sent to packs
+    suffix = [0] * (len(values) + 1)
+    for i in range(len(values) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + values[i]
+    return suffix
@@ -0,0 +1,174 @@
+import os
+import time
+
+import numpy as np
+
+from models import CARD_COUNT
+
+# One row per market snapshot: when, and per card number the cheapest price
+# (NaN when unlisted) and the units listed
+ROW = np.dtype([("ts", "f8"), ("price", "f4", (CARD_COUNT + 1,)), ("depth", "u4", (CARD_COUNT + 1,))])
+
+class PriceStats:
+    # Per-card rolling statistics over one window, as arrays indexed by card number
+    def __init__(self, samples, low, median, cheap):
+        self.samples = samples
+        self.low = low
+        self.median = median
+        # The `bargain_quantile` price
+        self.cheap = cheap
+
+class PriceHistory:
+    # Cheapest price and depth of every card over time, in two fixed-size tiers
+    # memory-mapped from disk. Snapshots go into `recent` at most every
+    # `min_interval` seconds. Once it fills up, its older half is compacted
+    # into `archive` as one median row per `bucket` seconds, and when the
+    # archive fills up its oldest half is dropped. So the files, and what
+    # is resident in memory, never grow past the configured capacities.
+    # Without a path the tiers live in memory only.
+
+    def __init__(self, config):
+        history_config = config.get("price_history", {})
+        self.path = history_config.get("path")
+        self.min_interval = history_config.get("min_interval", 30)
+        self.bucket = history_config.get("bucket", 900)
+        self.window = history_config.get("window", 86400)
+        self.min_samples = history_config.get("min_samples", 20)
+        self.spike_margin = history_config.get("spike_margin", 0.25)
+        self.bargain_quantile = history_config.get("bargain_quantile", 0.1)
+        self.recent, self.recent_count = self._open("recent", history_config.get("recent_rows", 4096))
+        self.archive, self.archive_count = self._open("archive", history_config.get("archive_rows", 2880))
+        self.stats = {"recorded": 0, "skipped": 0, "compactions": 0}
+        # ((snapshots recorded, window), PriceStats)
+        self._cached = None
+
+    def _open(self, tier, rows):
+        if not self.path:
+            return np.zeros(rows, dtype=ROW), 0
+        path = f"{self.path}.{tier}.bin"
+        if os.path.exists(path) and os.path.getsize(path) != rows * ROW.itemsize:
+            print(f"⚠️ Price history {path} was written with another size, starting it over")
+            os.remove(path)
+        table = np.memmap(path, dtype=ROW, mode="r+" if os.path.exists(path) else "w+", shape=(rows,))
+        # Rows are filled front to back and cleared on compaction, so the used ones have a time
+        return table, int(np.count_nonzero(table["ts"]))
+
+    def record(self, listings, now=None):
+        now = time.time() if now is None else now
+        if self.recent_count and now - self.recent["ts"][self.recent_count - 1] < self.min_interval:
+            self.stats["skipped"] += 1
+            return False
+        price = np.full(CARD_COUNT + 1, np.inf, dtype=np.float32)
+        depth = np.zeros(CARD_COUNT + 1, dtype=np.uint32)
+        # A streamed market only keeps the cheapest listings of most cards, so
+        # depth is what's listed near the top of the book
+        for listing in listings:
+            card_number = listing.card.number
+            if 0 < card_number <= CARD_COUNT:
+                depth[card_number] += listing.quantity
+                if listing.price < price[card_number]:
+                    price[card_number] = listing.price
+        price[np.isinf(price)] = np.nan
+        if self.recent_count == len(self.recent):
+            self._compact()
+        self.recent["ts"][self.recent_count] = now
+        self.recent["price"][self.recent_count] = price
+        self.recent["depth"][self.recent_count] = depth
+        self.recent_count += 1
+        self.stats["recorded"] += 1
+        return True
+
+    def _compact(self):
+        half = len(self.recent) // 2
+        old = self.recent[:half]
+        buckets = (old["ts"] // self.bucket).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        ends = np.r_[starts[1:], half]
+        rows = np.zeros(len(starts), dtype=ROW)
+        for index, (start, end) in enumerate(zip(starts, ends)):
+            rows["ts"][index] = old["ts"][start]
+            rows["price"][index] = _quantile(*_sorted(old["price"][start:end]), 0.5)
+            rows["depth"][index] = np.median(old["depth"][start:end], axis=0)
+        rows = rows[-len(self.archive):]
+        if self.archive_count + len(rows) > len(self.archive):
+            keep = min(len(self.archive) // 2, len(self.archive) - len(rows))
+            self.archive[:keep] = self.archive[self.archive_count - keep:self.archive_count]
+            self.archive[keep:] = np.zeros(1, dtype=ROW)
+            self.archive_count = keep
+        self.archive[self.archive_count:self.archive_count + len(rows)] = rows
+        self.archive_count += len(rows)
+
+        self.recent[:self.recent_count - half] = self.recent[half:self.recent_count]
+        self.recent[self.recent_count - half:] = np.zeros(1, dtype=ROW)
+        self.recent_count -= half
+        self.stats["compactions"] += 1
+        self.flush()
+
+    def _window_prices(self, window):
+        since = time.time() - window
+        recent = self.recent[:self.recent_count]
+        blocks = [recent["price"][np.searchsorted(recent["ts"], since):]]
+        if self.recent_count and recent["ts"][0] > since:
+            # Older than the recent tier, one median row per bucket
+            archive = self.archive[:self.archive_count]
+            blocks.insert(0, archive["price"][np.searchsorted(archive["ts"], since):])
+        return np.concatenate(blocks)
+
+    def rolling(self, window=None):
+        window = window or self.window
+        # Recomputed once per recorded snapshot, however often the planner asks
+        key = (self.stats["recorded"], window)
+        if self._cached is None or self._cached[0] != key:
+            ordered, samples = _sorted(self._window_prices(window))
+            self._cached = (key, PriceStats(
+                samples,
+                _quantile(ordered, samples, 0.0),
+                _quantile(ordered, samples, 0.5),
+                _quantile(ordered, samples, self.bargain_quantile),
+            ))
+        return self._cached[1]
+
+    def known(self, card_number):
+        return 0 < card_number <= CARD_COUNT and self.rolling().samples[card_number] >= self.min_samples
+
+    def median(self, card_number):
+        return float(self.rolling().median[card_number]) if self.known(card_number) else None
+
+    def is_spike(self, card_number, price):
+        # Listed well above what the card usually goes for; waiting should bring it back
+        median = self.median(card_number)
+        return median is not None and price > median * (1 + self.spike_margin)
+
+    def is_bargain(self, card_number, price):
+        # Among the cheapest prices the card has had lately, and unlikely to last
+        if not self.known(card_number):
+            return False
+        stats = self.rolling()
+        return price <= stats.cheap[card_number] and price < stats.median[card_number]
+
+    def flush(self):
+        for table in (self.recent, self.archive):
+            if isinstance(table, np.memmap):
+                table.flush()
+
+    def close(self):
+        self.flush()
+
+    def summary(self):
+        span = self.recent["ts"][self.recent_count - 1] - self.recent["ts"][0] if self.recent_count else 0
+        return (f"{self.recent_count} snapshots over {span / 3600:.1f}h, {self.archive_count} archived buckets, "
+                f"{self.stats['compactions']} compactions")
+
+def _sorted(prices):
+    # Each column sorted, with its number of prices. Sorting puts the NaNs
+    # (unlisted) last, so the first `samples` rows of a column are its prices.
+    ordered = np.sort(prices, axis=0)
+    return ordered, np.count_nonzero(~np.isnan(ordered), axis=0)
+
+def _quantile(ordered, samples, q):
+    if not len(ordered):
+        return np.full(CARD_COUNT + 1, np.nan)
+    index = np.floor(q * np.maximum(samples - 1, 0)).astype(np.int64)
+    values = np.take_along_axis(ordered, index[None, :], axis=0)[0].astype(float)
+    values[samples == 0] = np.nan
+    return values
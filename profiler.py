@@ -0,0 +1,216 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+
+from metrics import Histogram
+
+# Samples of these are a thread waiting for work, not doing any
+IDLE_FUNCTIONS = {"select", "poll", "epoll", "wait", "_worker", "get", "sleep"}
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+def _is_stats_row(line):
+    # "ncalls tottime percall cumtime percall filename:lineno(function)"
+    parts = line.split()
+    try:
+        float(parts[1])
+        return True
+    except (IndexError, ValueError):
+        return False
+
+class Profiler:
+    # Opt-in profiling of the bot's phases. Modes:
+    #   timers   - wall time per phase and event-loop lag only
+    #   cprofile - plus one cProfile per phase, dumped as .pstats
+    #   sample   - plus a sampling thread writing collapsed stacks (flamegraph.pl,
+    #              speedscope) with the phase as the root frame
+    # Profilers run for the first `cycles` cycles, the timers and the loop
+    # watchdog for as long as the bot does. Phases of concurrent jobs overlap,
+    # so a sample belongs to whichever phase was entered last.
+
+    def __init__(self, config):
+        profiling_config = config.get("profiling", {})
+        self.mode = profiling_config.get("mode")
+        self.enabled = bool(self.mode)
+        self.cycles = profiling_config.get("cycles", 5)
+        self.sample_interval = profiling_config.get("sample_interval", 0.005)
+        self.lag_interval = profiling_config.get("lag_interval", 0.05)
+        self.block_threshold = profiling_config.get("block_threshold", 0.1)
+        self.output = profiling_config.get("output", "profile")
+
+        self.cycle = 0
+        self.profiling = self.mode in ("cprofile", "sample")
+        self.active = []
+        self.phase_times = {}
+        self.lag = Histogram(LAG_BUCKETS)
+        self.blocks = []
+        self.stacks = {}
+        self.profiles = {}
+        self._heartbeat = time.monotonic()
+        self._loop_thread = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lag_task = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._lag_task = asyncio.create_task(self._measure_lag())
+        self._thread = threading.Thread(target=self._watch, name="profiler", daemon=True)
+        self._thread.start()
+        print(f"🔬 Profiling in {self.mode} mode" + (f" for {self.cycles} cycles" if self.profiling else ""))
+
+    # Phases
+
+    def enter(self, name):
+        if not self.enabled:
+            return
+        if self.mode == "cprofile" and self.profiling:
+            if self.active:
+                self.profiles[self.active[-1]].disable()
+            self.profiles.setdefault(name, cProfile.Profile()).enable()
+        self.active.append(name)
+
+    def exit(self, name, seconds):
+        if not self.enabled:
+            return
+        self.phase_times.setdefault(name, Histogram()).observe(seconds)
+        if name in self.active:
+            # The last entry of this name, phases of other jobs may be on top of it
+            index = len(self.active) - 1 - self.active[::-1].index(name)
+            del self.active[index]
+        if self.mode == "cprofile" and self.profiling:
+            self.profiles[name].disable()
+            if self.active:
+                self.profiles.setdefault(self.active[-1], cProfile.Profile()).enable()
+
+    def cycle_end(self):
+        if not self.enabled:
+            return
+        self.cycle += 1
+        if self.profiling and self.cycle >= self.cycles:
+            self.profiling = False
+            for profile in self.profiles.values():
+                profile.disable()
+            self.write()
+            print(self.summary())
+
+    # Event loop lag and blocking
+
+    async def _measure_lag(self):
+        while True:
+            expected = time.monotonic() + self.lag_interval
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            self.lag.observe(max(0.0, time.monotonic() - expected))
+
+    def _watch(self):
+        # Samples stacks and watches the loop's heartbeat. A heartbeat older than
+        # the threshold means sync code is holding the loop; its stack is kept.
+        interval = self.sample_interval if self.mode == "sample" else self.lag_interval / 2
+        blocked_since = None
+        blocked_stack = None
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            stale = time.monotonic() - self._heartbeat - self.lag_interval
+            if stale > self.block_threshold:
+                if blocked_since is None:
+                    blocked_since = self._heartbeat + self.lag_interval
+                    blocked_stack = self._frames(frames.get(self._loop_thread))
+            elif blocked_since is not None:
+                self.blocks.append((time.monotonic() - blocked_since, self._phase(), blocked_stack))
+                blocked_since = None
+            if self.mode == "sample" and self.profiling:
+                self._sample(frames)
+
+    def _phase(self):
+        return self.active[-1] if self.active else "idle"
+
+    def _frames(self, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return stack[::-1]
+
+    def _sample(self, frames):
+        phase = self._phase()
+        for thread in threading.enumerate():
+            if thread.ident == threading.get_ident() or thread.ident not in frames:
+                continue
+            frame = frames[thread.ident]
+            if thread.ident != self._loop_thread and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            # Frames without line numbers, so samples of the same function add up
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                frame = frame.f_back
+            key = ";".join([phase, thread.name] + stack[::-1])
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    # Output
+
+    def write(self):
+        if self.stacks:
+            with open(f"{self.output}.folded", "w") as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        for name, profile in self.profiles.items():
+            profile.dump_stats(f"{self.output}-{name}.pstats")
+        with open(f"{self.output}.txt", "w") as f:
+            f.write(self.summary() + "\n")
+
+    def _top_functions(self, name, limit=5):
+        if name in self.profiles:
+            out = io.StringIO()
+            try:
+                stats = pstats.Stats(self.profiles[name], stream=out)
+            except TypeError:
+                # Entered, but never ran long enough to record a call
+                return []
+            stats.sort_stats("tottime").print_stats(limit)
+            return [line.strip() for line in out.getvalue().splitlines() if _is_stats_row(line)][:limit]
+        # Self samples: the leaf frame of each stack under this phase
+        leaves = {}
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            if frames[0] == name:
+                leaves[frames[-1]] = leaves.get(frames[-1], 0) + count
+        total = sum(leaves.values()) or 1
+        return [f"{count / total:6.1%}  {leaf}" for leaf, count in sorted(leaves.items(), key=lambda item: -item[1])[:limit]]
+
+    def summary(self):
+        lines = [f"🔬 Profile after {self.cycle} cycles ({self.mode} mode)",
+                 f"{'phase':<12} {'count':>6} {'total':>9} {'mean':>9} {'p95':>9}"]
+        for name, hist in sorted(self.phase_times.items(), key=lambda item: -item[1].sum):
+            lines.append(f"{name:<12} {hist.count:>6} {hist.sum * 1000:>7.0f}ms {hist.sum / hist.count * 1000:>7.1f}ms "
+                         f"{hist.quantile(0.95) * 1000:>7.1f}ms")
+            for line in self._top_functions(name):
+                lines.append(f"    {line}")
+        lines.append(f"event loop lag: p50 {self.lag.quantile(0.5) * 1000:.1f}ms, p99 {self.lag.quantile(0.99) * 1000:.1f}ms "
+                     f"over {self.lag.count} checks, {len(self.blocks)} blocks over {self.block_threshold * 1000:.0f}ms")
+        for seconds, phase, stack in sorted(self.blocks, key=lambda block: -block[0])[:5]:
+            where = " <- ".join(reversed(stack[-3:])) if stack else "?"
+            lines.append(f"    blocked {seconds * 1000:.0f}ms in {phase}: {where}")
+        return "\n".join(lines)
+
+    async def stop(self):
+        if not self.enabled:
+            return
+        self._stop.set()
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+        self.profiling = False
+        for profile in self.profiles.values():
+            profile.disable()
+        self.write()
+        print(self.summary())
@@ -0,0 +1,176 @@
+import asyncio
+import gzip
+import json
+import time
+
+import httpx
+
+SESSION_VERSION = 1
+# Response headers that still mean something once the body is stored decoded
+KEPT_HEADERS = ("content-type", "etag", "last-modified", "retry-after", "date")
+REDACTED = "recorded-session"
+
+def load_session(path):
+    # Header dict and the recorded exchanges; a file cut short by a crash just ends early
+    entries = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            header = json.loads(f.readline())
+            for line in f:
+                entries.append(json.loads(line))
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            pass
+    if header.get("version") != SESSION_VERSION:
+        raise ValueError(f"{path} is not a version {SESSION_VERSION} session file")
+    return header, entries
+
+class SessionExhausted(Exception):
+    # The bot asked for more than the recorded run did
+    pass
+
+def request_key(method, path):
+    return f"{method} {path}"
+
+def _redact(path, request_body, response_body):
+    # The session file is for sharing; it never holds our password or a live token
+    if path.endswith("/login"):
+        try:
+            request_body = json.dumps({**json.loads(request_body), "password": REDACTED})
+            response_body = json.dumps({**json.loads(response_body), "token": REDACTED})
+        except (ValueError, TypeError):
+            pass
+    return request_body, response_body
+
+class SessionRecorder(httpx.AsyncBaseTransport):
+    # Sits between the client and the real transport and writes every exchange
+    # to a gzipped JSON-lines file: when it was sent, what was asked, what came
+    # back and how long it took. Bodies are read whole, so streamed responses
+    # are buffered while recording. `run` (the username and the seed the bot's
+    # random draws start from) goes in the header, so a replay can redo them.
+
+    def __init__(self, inner, path, run=None):
+        self.inner = inner
+        self.path = path
+        self.started = time.monotonic()
+        self.count = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": SESSION_VERSION, "recorded_at": time.time(), **(run or {})})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    async def handle_async_request(self, request):
+        sent_at = time.monotonic()
+        response = await self.inner.handle_async_request(request)
+        content = await response.aread()
+        latency = time.monotonic() - sent_at
+        path = request.url.raw_path.decode()
+        request_body, response_body = _redact(path, request.content.decode("utf-8", "replace"),
+                                              content.decode("utf-8", "replace"))
+        self._write({
+            "t": round(sent_at - self.started, 4),
+            "latency": round(latency, 4),
+            "key": request_key(request.method, path),
+            "body": request_body or None,
+            "status": response.status_code,
+            "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            "response": response_body,
+        })
+        self.count += 1
+        return response
+
+    async def aclose(self):
+        self._file.close()
+        print(f"📼 Recorded {self.count} requests to {self.path}")
+        await self.inner.aclose()
+
+class SessionReplayer(httpx.AsyncBaseTransport):
+    # Answers requests from a recorded session instead of the network.
+    # match="key": each request gets the next recorded response for the same
+    # method and path.
+    # match="order": responses come back in recorded order, falling back to the
+    # key when the bot asks for something else than it did back then.
+    # speed scales the recorded latencies and claim waits: 1 is real time,
+    # 10 is ten times faster, 0 answers at once.
+    # Once the recorded answers for a request run out the replay is over:
+    # `on_exhausted` is called and every request after that fails.
+
+    def __init__(self, path, speed=1.0, match="key"):
+        header, entries = load_session(path)
+        self.header = header
+        self.path = path
+        self.speed = speed
+        self.match = match
+        self.entries = entries
+        self.position = 0
+        # key -> indices into entries, in recorded order
+        self.by_key = {}
+        for index, entry in enumerate(entries):
+            self.by_key.setdefault(entry["key"], []).append(index)
+        self.served = [False] * len(entries)
+        self.exhausted = None
+        self.on_exhausted = None
+        self.stats = {"served": 0, "mismatches": 0, "missing": 0}
+        print(f"📼 Replaying {len(entries)} requests from {path} ({match} match, {speed}x speed)")
+
+    def _take(self, index):
+        self.served[index] = True
+        while self.position < len(self.entries) and self.served[self.position]:
+            self.position += 1
+        return self.entries[index]
+
+    def _pick(self, key):
+        if self.match == "order" and self.position < len(self.entries):
+            if self.entries[self.position]["key"] == key:
+                return self._take(self.position)
+            self.stats["mismatches"] += 1
+        indices = self.by_key.get(key)
+        if not indices:
+            return None
+        index = next((index for index in indices if not self.served[index]), None)
+        if index is None:
+            self._run_out(key)
+        return self._take(index)
+
+    def _run_out(self, key):
+        # Answering with an old response instead would send the bot down a path
+        # the recorded run never took
+        if self.exhausted is None:
+            self.exhausted = key
+            print(f"📼 The recording has no more answers for {key}, ending the replay")
+            if self.on_exhausted is not None:
+                self.on_exhausted()
+        raise SessionExhausted(f"recording ran out at {self.exhausted}")
+
+    def _body(self, entry):
+        body = entry["response"]
+        if self.speed and self.speed != 1 and entry["key"].endswith("/teapot-status"):
+            # The bot sleeps for whatever the server says; scale that too
+            try:
+                data = json.loads(body)
+                data["seconds_until_next_reward"] = data["seconds_until_next_reward"] / self.speed
+                body = json.dumps(data)
+            except (ValueError, KeyError, TypeError):
+                pass
+        return body.encode()
+
+    async def handle_async_request(self, request):
+        key = request_key(request.method, request.url.raw_path.decode())
+        if self.exhausted is not None:
+            self._run_out(key)
+        entry = self._pick(key)
+        if entry is None:
+            self.stats["missing"] += 1
+            return httpx.Response(404, json={"message": "Not in recording"}, request=request)
+        if self.speed:
+            await asyncio.sleep(entry["latency"] / self.speed)
+        self.stats["served"] += 1
+        return httpx.Response(entry["status"], headers=entry["headers"], content=self._body(entry), request=request)
+
+    def summary(self):
+        ran_out = f", ran out at {self.exhausted}" if self.exhausted is not None else ""
+        return (f"{self.stats['served']} served, {self.stats['mismatches']} out of order, "
+                f"{self.stats['missing']} not recorded{ran_out}")
+
+    async def aclose(self):
+        print(f"📼 Replay of {self.path}: {self.summary()}")
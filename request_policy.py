@@ -0,0 +1,165 @@
+import asyncio
+import random
+import time
+
+import httpx
+
+# Worth another try: the backend is waking up, overloaded or asking us to slow down
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class RequestFailed:
+    # Stands in for the data of a call that didn't get a usable answer, so an
+    # outage can't be mistaken for an empty market. It is falsy, but on purpose
+    # not iterable: callers check for it before they use the data.
+
+    __slots__ = ("reason", "status")
+
+    def __init__(self, reason, status=None):
+        self.reason = reason
+        self.status = status
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"RequestFailed({self.reason!r})"
+
+    def __str__(self):
+        return self.reason
+
+def failed(result):
+    return isinstance(result, RequestFailed)
+
+class TokenBucket:
+    # `rate` requests per second on average, bursts of up to `burst`
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        # Waiters queue on the lock, so they're served in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` failures in a row and holds every request
+    # back until `reset_timeout` has passed. Then a single probe goes out: success
+    # closes the circuit, failure opens it again for twice as long.
+
+    def __init__(self, log, failure_threshold=5, reset_timeout=5, max_reset_timeout=120):
+        self.log = log
+        self.failure_threshold = failure_threshold
+        self.base_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.open_until = None
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self.paused = 0.0
+
+    async def admit(self):
+        while self.open_until is not None:
+            delay = self.open_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif not self.probing:
+                self.probing = True
+                return
+            else:
+                # Someone else's probe is out, see how it went
+                await asyncio.sleep(min(1, self.base_timeout))
+
+    def record(self, ok):
+        if ok:
+            if self.open_until is not None:
+                self.paused += time.monotonic() - self.opened_at
+                self.log.info("breaker_closed", "🔌 Backend is answering again after {seconds:.0f}s, resuming requests",
+                              seconds=time.monotonic() - self.opened_at)
+            self.failures = 0
+            self.open_until = None
+            self.opened_at = None
+            self.probing = False
+            self.reset_timeout = self.base_timeout
+            return
+        self.failures += 1
+        if self.probing or (self.open_until is None and self.failures >= self.failure_threshold):
+            if self.probing:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self.trips += 1
+            self.probing = False
+            if self.opened_at is None:
+                self.opened_at = time.monotonic()
+            self.open_until = time.monotonic() + self.reset_timeout
+            self.log.warning("breaker_open", "🔌 Backend looks down after {failures} failures, pausing requests for {timeout:.0f}s",
+                             failures=self.failures, timeout=self.reset_timeout)
+
+    def abandon(self):
+        # A probe that was cancelled never learned anything
+        self.probing = False
+
+class RequestPolicy:
+    # What every request goes through before it reaches the backend: the
+    # circuit breaker, then the rate limiter. Also decides which failures are
+    # retried and after how long.
+
+    def __init__(self, config, log):
+        self.config = config.get("policy", {})
+        self.limiter = TokenBucket(self.config.get("rate", 10), self.config.get("burst", 20))
+        self.breaker = CircuitBreaker(
+            log,
+            self.config.get("failure_threshold", 5),
+            self.config.get("reset_timeout", 5),
+            self.config.get("max_reset_timeout", 120),
+        )
+
+    async def admit(self):
+        await self.breaker.admit()
+        await self.limiter.acquire()
+
+    def record(self, resp=None, error=None):
+        # Only outages count against the breaker; a 4xx is the backend working fine
+        if error is not None:
+            self.breaker.record(False)
+        else:
+            self.breaker.record(resp.status_code < 500)
+
+    def retries(self, method):
+        # Only requests that are safe to repeat; a retried buy could buy twice
+        return self.config.get("get_retries", 2) if method == "GET" else 0
+
+    def should_retry(self, resp=None, error=None):
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+        return resp.status_code in RETRYABLE_STATUSES
+
+    def retry_delay(self, attempt, resp=None):
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.config.get("max_retry_delay", 8))
+            except ValueError:
+                pass
+        backoff = min(self.config.get("max_retry_delay", 8), self.config.get("retry_delay", 0.5) * 2 ** attempt)
+        # Equal jitter, same as the timers
+        return random.uniform(backoff / 2, backoff)
+
+    def summary(self):
+        return (f"{self.breaker.trips} breaker trips, {self.breaker.paused:.1f}s paused, "
+                f"{self.limiter.waited:.1f}s rate limited")
@@ -0,0 +1,112 @@
+import asyncio
+import random
+import time
+import traceback
+
+class Timer:
+    # One recurring job running in its own task. After each run it is due again
+    # `interval` seconds later, unless the job picked a time itself with
+    # schedule_in. adapt() moves the interval between its bounds: back to the
+    # minimum when something interesting happened, stretched by `growth` when
+    # nothing did. Failing jobs back off exponentially with jitter.
+
+    def __init__(self, name, job, log, interval, max_interval=None, growth=1.5, error_delay=1, max_error_delay=60):
+        self.name = name
+        self.log = log
+        self.job = job
+        self.min_interval = interval
+        self.max_interval = max_interval or interval
+        self.interval = interval
+        self.growth = growth
+        self.error_delay = error_delay
+        self.max_error_delay = max_error_delay
+        self.next_at = time.monotonic()
+        self.runs = 0
+        self.errors = 0
+        self._scheduled = None
+        self._wake = asyncio.Event()
+
+    def schedule_in(self, delay):
+        self.next_at = time.monotonic() + max(0, delay)
+        self._scheduled = self.next_at
+        self._wake.set()
+
+    def fire_now(self):
+        self.schedule_in(0)
+
+    def adapt(self, changed):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.growth)
+
+    def due_in(self):
+        return max(0, self.next_at - time.monotonic())
+
+    async def run(self):
+        while True:
+            delay = self.next_at - time.monotonic()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._scheduled = None
+            try:
+                await self.job(self)
+            except Exception as e:
+                self.errors += 1
+                backoff = min(self.max_error_delay, self.error_delay * 2 ** (self.errors - 1))
+                # Equal jitter: at least half the backoff, and timers that failed together don't retry together
+                delay = random.uniform(backoff / 2, backoff)
+                self.log.error("timer_failed", "😱 {timer} failed: {error}. Retrying in {delay:.1f}s",
+                               timer=self.name, error=str(e), delay=delay, traceback=traceback.format_exc())
+                self.next_at = time.monotonic() + delay
+                continue
+            self.errors = 0
+            self.runs += 1
+            if self._scheduled is None:
+                self.next_at = time.monotonic() + self.interval
+
+class Scheduler:
+    def __init__(self, config, log):
+        self.config = config.get("scheduler", {})
+        self.log = log
+        self.timers = {}
+        self._done = None
+
+    def add(self, name, job, interval, max_interval=None):
+        self.timers[name] = Timer(
+            name, job, self.log, interval, max_interval,
+            growth=self.config.get("growth", 1.5),
+            error_delay=self.config.get("error_delay", 1),
+            max_error_delay=self.config.get("max_error_delay", 60),
+        )
+        return self.timers[name]
+
+    def __getitem__(self, name):
+        return self.timers[name]
+
+    def stop(self):
+        if self._done is not None:
+            self._done.set()
+
+    async def run(self):
+        self._done = asyncio.Event()
+        tasks = [asyncio.create_task(timer.run()) for timer in self.timers.values()]
+        try:
+            await self._done.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def summary(self):
+        return " | ".join(
+            f"{name} in {timer.due_in():.1f}s (every {timer.interval:.1f}s)" if timer.max_interval != timer.min_interval
+            else f"{name} in {timer.due_in():.1f}s"
+            for name, timer in self.timers.items()
+        )
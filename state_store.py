@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+STATE_VERSION = 1
+
+class StateStore:
+    # One compact JSON file holding whatever lets a restart skip work: the
+    # session token, cached snapshots with their validators, the last known
+    # inventory and the calibrated pack model. Written to a temp file and
+    # renamed, so a crash mid-write leaves the previous state intact.
+
+    def __init__(self, config):
+        state_config = config.get("state", {})
+        self.path = state_config.get("path")
+        self.save_interval = state_config.get("save_interval", 30)
+        self.username = config.get("user", {}).get("username")
+        self.data = {}
+        self.providers = {}
+        self.loaded = False
+        self.last_save = None
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable state file {self.path}: {e}")
+            return
+        # Another account's token and cards are no use to us
+        if data.get("version") != STATE_VERSION or data.get("username") != self.username:
+            print(f"⚠️ State file {self.path} belongs to another account or version, starting cold")
+            return
+        self.data = data
+        self.loaded = True
+        print(f"💾 Loaded state saved {time.time() - data.get('saved_at', time.time()):.0f}s ago")
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def track(self, key, provider):
+        # provider() is called for a fresh value of `key` on every save
+        self.providers[key] = provider
+
+    def due(self):
+        return self.last_save is None or time.monotonic() - self.last_save >= self.save_interval
+
+    def save(self, force=False):
+        if not self.path or (not force and not self.due()):
+            return False
+        for key, provider in self.providers.items():
+            self.data[key] = provider()
+        self.data.update(version=STATE_VERSION, username=self.username, saved_at=time.time())
+        tmp_path = f"{self.path}.tmp"
+        try:
+            # The token is a credential, keep it private to this user
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.data, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ Couldn't save state to {self.path}: {e}")
+            return False
+        self.last_save = time.monotonic()
+        return True
@@ -0,0 +1,27 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from market_stream import MarketStreamParser
+
+ENTRIES = [
+    {"id": 1, "card": {"number": 3, "name": "Teapot", "holo": False}, "price": 4.5, "quantity": 2},
+    {"id": 2, "card": {"number": 3, "name": "Teapot", "holo": False}, "price": 2.0, "quantity": 1},
+    {"id": 3, "card": {"number": 82, "name": "Thé ☕", "holo": True}, "price": 30.0, "quantity": 1},
+]
+
+def parse(body, split):
+    parser = MarketStreamParser(top_k=5)
+    parser.feed(body[:split])
+    parser.feed(body[split:])
+    return sorted((listing.id, listing.price) for listing in parser.result())
+
+def test_body_split_at_every_offset():
+    expected = sorted((entry["id"], entry["price"]) for entry in ENTRIES)
+    for body in (
+        json.dumps({"entries": ENTRIES}, ensure_ascii=False).encode(),
+        json.dumps({"total": 3, "entries": ENTRIES}, ensure_ascii=False).encode(),
+    ):
+        for split in range(len(body) + 1):
+            assert parse(body, split) == expected, (body[:split], body[split:])
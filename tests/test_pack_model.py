@@ -0,0 +1,28 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models import Card
+from pack_model import PackSimulator
+
+CONFIG = {"pack_model": {"trials": 1000, "max_packs": 5000, "recalibrate_every": 25, "seed": 0}}
+
+def test_unseen_cards_keep_their_base_odds():
+    model = PackSimulator(CONFIG)
+    missing_regular, missing_holo = 1, 81
+    base_regular = model.expected_packs([missing_regular]).mean
+    base_holo = model.expected_packs([missing_holo]).mean
+
+    # Uniform packs that just happen to never draw the missing cards
+    rng = np.random.default_rng(1)
+    for _ in range(100):
+        numbers = list(rng.integers(2, 81, size=5))
+        if rng.random() < 0.2:
+            numbers.append(int(rng.integers(82, 96)))
+        model.observe_pack([Card(int(number), holo=number > 80) for number in numbers])
+
+    assert model.observed_packs == 100
+    assert abs(model.expected_packs([missing_regular]).mean - base_regular) < 0.2 * base_regular
+    assert abs(model.expected_packs([missing_holo]).mean - base_holo) < 0.2 * base_holo
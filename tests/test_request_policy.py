@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api_client import APIClient
+from request_policy import failed
+
+CONFIG = {
+    "user": {"username": "test", "password": "test"},
+    "policy": {"rate": 0, "failure_threshold": 5, "reset_timeout": 0.05, "get_retries": 0},
+    "market": {"streaming": True, "top_k": 20},
+    "metrics": {"path": None, "summary_every": 0},
+    "log": {"console_level": "error"},
+}
+
+def test_unparseable_probe_releases_the_breaker():
+    # Five 503s open the circuit; the probe after it gets a 200 the stream
+    # parser can't read. The next request must still go out.
+    responses = [httpx.Response(503)] * 5 + [
+        httpx.Response(200, json={"entries": [{"id": 1, "price": 1.0}]}),
+        httpx.Response(200, json={"entries": [{"id": 2, "card": {"number": 3}, "price": 2.0}]}),
+    ]
+
+    def handler(request):
+        return responses.pop(0)
+
+    async def run():
+        api_client = APIClient(CONFIG, transport=httpx.MockTransport(handler))
+        try:
+            for _ in range(5):
+                assert failed(await api_client.get_market_listings(fresh=True))
+            assert api_client.policy.breaker.open_until is not None
+            assert failed(await api_client.get_market_listings(fresh=True))
+            listings = await asyncio.wait_for(api_client.get_market_listings(fresh=True), 2)
+            assert [listing.id for listing in listings] == [2]
+        finally:
+            await api_client.close()
+
+    asyncio.run(run())
@@ -0,0 +1,130 @@
+import math
+import time
+
+import numpy as np
+
+class IncomeModel:
+    # The teapot claim is our only income: `reward` coins every `interval`
+    # seconds, both learnt from the claims we make. Projects when a balance
+    # will cover a cost.
+
+    def __init__(self, config):
+        income_config = config.get("income", {})
+        self.reward = income_config.get("reward")
+        self.interval = income_config.get("interval")
+        self.smoothing = income_config.get("smoothing", 0.3)
+        self.next_claim_at = None
+        self.claims = 0
+
+    def _blend(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def observe_claim(self, reward):
+        if reward:
+            self.claims += 1
+            self.reward = self._blend(self.reward, reward)
+
+    def observe_wait(self, seconds, after_claim=False):
+        # Right after a claim, the wait is the whole claim interval
+        self.next_claim_at = time.monotonic() + seconds
+        if after_claim and seconds > 0:
+            self.interval = self._blend(self.interval, seconds)
+
+    def known(self):
+        return bool(self.reward) and bool(self.interval)
+
+    def time_to_afford(self, balance, costs):
+        # Seconds until the balance covers each of `costs`, claims landing at the
+        # next claim time and every interval after that
+        costs = np.asarray(costs, dtype=float)
+        if not self.known():
+            return np.where(costs <= balance, 0.0, np.inf)
+        first = self.interval if self.next_claim_at is None else max(0.0, self.next_claim_at - time.monotonic())
+        claims = np.ceil(np.maximum(0.0, costs - balance) / self.reward)
+        return np.where(claims > 0, first + (claims - 1) * self.interval, 0.0)
+
+    def snapshot(self):
+        return {"reward": self.reward, "interval": self.interval, "claims": self.claims}
+
+    def restore(self, snapshot):
+        if snapshot:
+            self.reward = snapshot.get("reward") or self.reward
+            self.interval = snapshot.get("interval") or self.interval
+            self.claims = snapshot.get("claims", 0)
+
+class Forecast:
+    def __init__(self, step, eta, eta_high, cost, candidates):
+        self.step = step
+        self.eta = eta
+        self.eta_high = eta_high
+        self.cost = cost
+        self.candidates = candidates
+
+    def summary(self):
+        if self.step is None:
+            return "nothing left to plan"
+        if math.isinf(self.eta):
+            return f"next {self.step['type']} for card {self.step['card']}, ETA unknown until a claim pays out"
+        return (f"next {self.step['type']} for card {self.step['card']}, complete in ~{format_duration(self.eta)} "
+                f"(90% within {format_duration(self.eta_high)}, ~${self.cost:.2f} to spend)")
+
+def format_duration(seconds):
+    if math.isinf(seconds):
+        return "?"
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.1f}h"
+
+class TimelinePlanner:
+    # Orders the steps of a plan by expected time to a complete collection.
+    # Claims pay the same whatever we buy, so the time is set by what we end up
+    # spending: per pack-simulation trial, packs for the plan's pack targets
+    # also bring some of the cards the plan buys, and a card bought before the
+    # packs that would have brought it is money (and time) wasted.
+
+    def __init__(self, pack_model, income):
+        self.pack_model = pack_model
+        self.income = income
+
+    def _drops(self, first, card_number, packs):
+        column = self.pack_model.column[card_number] if 0 < card_number < len(self.pack_model.column) else -1
+        if column < 0:
+            return np.zeros(len(packs), dtype=bool)
+        return first[:, column] <= packs
+
+    def forecast(self, plan, balance, pack_price):
+        if not plan.steps:
+            return Forecast(None, 0.0, 0.0, 0.0, [])
+        first = self.pack_model.first_hits()
+        pack_step = next((step for step in plan.steps if step['type'] == 'pack'), None)
+        buys = [step for step in plan.steps if step['type'] != 'pack']
+
+        packs = np.zeros(len(first))
+        if pack_step is not None:
+            columns = [self.pack_model.column[card_number] for card_number in pack_step['cards']]
+            columns = [column for column in columns if column >= 0]
+            if columns:
+                packs = first[:, columns].max(axis=1)
+
+        # Packs first: every buy the packs turn up is skipped
+        drops = [self._drops(first, step['card'], packs) for step in buys]
+        packs_first = packs * pack_price + sum(
+            (step['cost'] * ~dropped for step, dropped in zip(buys, drops)), np.zeros(len(first))
+        )
+
+        # Buying a step now pays for it even in the trials where a pack would have
+        # brought it. Ties go to the buy: a listed price can be gone by tomorrow.
+        candidates = [(step, packs_first + step['cost'] * dropped) for step, dropped in zip(buys, drops)]
+        if pack_step is not None:
+            candidates.append((pack_step, packs_first))
+        scored = []
+        for step, totals in candidates:
+            etas = self.income.time_to_afford(balance, totals)
+            scored.append((float(etas.mean()), step['type'] == 'pack', step['cost'], step, etas, totals))
+        scored.sort(key=lambda item: item[:3])
+        eta, _, _, step, etas, totals = scored[0]
+        eta_high = float(np.quantile(etas, 0.9)) if np.isfinite(etas).all() else float('inf')
+        return Forecast(step, eta, eta_high, float(totals.mean()),
+                        [(item[3], item[0]) for item in scored])